@@ -0,0 +1,45 @@
+"""Add token_hash to refresh_tokens
+
+Revision ID: b7e2c94f1d06
+Revises: 3a0320432a93
+Create Date: 2026-10-18 09:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c94f1d06'
+down_revision = '3a0320432a93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('refresh_tokens', sa.Column('token_hash', sa.String(length=64), nullable=True))
+
+    # Backfill the SHA-256 digest of the existing tokens
+    op.execute(
+        "UPDATE refresh_tokens "
+        "SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex') "
+        "WHERE token_hash IS NULL"
+    )
+
+    # Identical tokens could be issued in the same second before tokens carried a jti,
+    # keep only the newest row of each duplicate so the unique index can be built
+    op.execute(
+        "DELETE FROM refresh_tokens older "
+        "USING refresh_tokens newer "
+        "WHERE older.token_hash = newer.token_hash AND older.id < newer.id"
+    )
+
+    op.alter_column('refresh_tokens', 'token_hash',
+               existing_type=sa.String(length=64),
+               nullable=False)
+    op.create_index(op.f('ix_refresh_tokens_token_hash'), 'refresh_tokens', ['token_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_refresh_tokens_token_hash'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'token_hash')
@@ -0,0 +1,24 @@
+"""Add users created_at id index
+
+Revision ID: c41d8a7e5b23
+Revises: b7e2c94f1d06
+Create Date: 2026-10-18 10:05:47.263918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8a7e5b23'
+down_revision = 'b7e2c94f1d06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at_id', table_name='users')
@@ -0,0 +1,26 @@
+"""Add token_version to users
+
+Revision ID: d93f2b6c0a18
+Revises: c41d8a7e5b23
+Create Date: 2026-10-18 11:31:09.552841
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93f2b6c0a18'
+down_revision = 'c41d8a7e5b23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+    op.create_index(op.f('ix_users_updated_at'), 'users', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_users_updated_at'), table_name='users')
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,30 @@
+"""Opaque refresh tokens and refresh token families
+
+Revision ID: e17a4c9b3f52
+Revises: d93f2b6c0a18
+Create Date: 2026-10-18 12:05:41.218395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e17a4c9b3f52'
+down_revision = 'd93f2b6c0a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('refresh_tokens', 'token', existing_type=sa.String(length=1000), nullable=True)
+    op.add_column('refresh_tokens', sa.Column('family_id', sa.String(length=32), nullable=True))
+    op.create_index(op.f('ix_refresh_tokens_family_id'), 'refresh_tokens', ['family_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_refresh_tokens_family_id'), table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'family_id')
+    #opaque tokens have no stored value, they can't be kept as NOT NULL rows
+    op.execute("DELETE FROM refresh_tokens WHERE token IS NULL")
+    op.alter_column('refresh_tokens', 'token', existing_type=sa.String(length=1000), nullable=False)
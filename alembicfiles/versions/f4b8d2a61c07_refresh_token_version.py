@@ -0,0 +1,25 @@
+"""Token version of the user stored with each refresh token
+
+Revision ID: f4b8d2a61c07
+Revises: e17a4c9b3f52
+Create Date: 2026-10-18 16:42:09.531870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8d2a61c07'
+down_revision = 'e17a4c9b3f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    #existing tokens keep NULL and are accepted until they expire
+    op.add_column('refresh_tokens', sa.Column('token_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('refresh_tokens', 'token_version')
@@ -1,14 +1,70 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
 
 from app.config import settings
+from app.pool_metrics import PoolStats, instrumented_pool_class
 
-# Creates the BD engine in SQLAlchemy 
-engine = create_engine(settings.DATABASE_URL)
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Pool and connection options for the engine, taken from the settings.
+    Only PostgreSQL gets a sized queue pool, other backends keep their defaults.
+    """
+    if make_url(url).get_backend_name() != "postgresql":
+        return {}
+
+    pool_class = AsyncAdaptedQueuePool if is_async else QueuePool
+    stats = async_pool_stats if is_async else sync_pool_stats
+    if is_async:
+        server_settings = {"application_name": settings.DB_APPLICATION_NAME}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        connect_args = {"server_settings": server_settings}
+    else:
+        connect_args = {"application_name": settings.DB_APPLICATION_NAME}
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+
+    return {
+        "poolclass": instrumented_pool_class(pool_class, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
+
+# Creates the BD engine in SQLAlchemy
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 
 # creates a session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Creates the async engine only when it is selected, so asyncpg is not required in sync mode
+if settings.DATABASE_MODE == "async":
+    async_engine = create_async_engine(
+        settings.ASYNC_DATABASE_URL,
+        **engine_options(settings.ASYNC_DATABASE_URL, is_async=True)
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+def pool_stats() -> dict:
+    """Usage counters of the connection pools"""
+    stats = {"sync": sync_pool_stats.snapshot(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = async_pool_stats.snapshot(async_engine.pool)
+    return stats
 
 # Create the base class for declarative models
 Base = declarative_base()
@@ -23,4 +79,49 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    It creates an async database session on the asyncpg engine
+    and makes sure to close it when it is finished using it.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Session dependency used by the routes, selected with DATABASE_MODE
+get_session = get_async_db if settings.DATABASE_MODE == "async" else get_db
+
+def insert_do_nothing(db, model):
+    """
+    INSERT ... ON CONFLICT DO NOTHING for `model` on the session's dialect,
+    rows that hit any unique constraint are skipped instead of failing.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported on {dialect}")
+    return insert(model).on_conflict_do_nothing()
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run a synchronous service function without blocking the event loop.
+
+    With a sync Session the function runs in the worker thread pool.
+    With an AsyncSession it runs on the event loop through `run_sync`,
+    receiving the session's sync facade in place of the AsyncSession,
+    so every database call is awaited on the async driver.
+    """
+    session = next((arg for arg in (*args, *kwargs.values()) if isinstance(arg, AsyncSession)), None)
+    if session is None:
+        return await run_in_threadpool(func, *args, **kwargs)
+
+    def call(sync_session):
+        sync_args = [sync_session if arg is session else arg for arg in args]
+        sync_kwargs = {key: sync_session if value is session else value for key, value in kwargs.items()}
+        return func(*sync_args, **sync_kwargs)
+
+    return await session.run_sync(call)
\ No newline at end of file
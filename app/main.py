@@ -1,9 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+import asyncio
 import logging
+import anyio
 
-from app.routes import auth_router, user_router
+from app.routes import auth_router, user_router, status_router, well_known_router
 from app.config import settings
+from app.database import async_engine, engine, pool_stats
+from app.metrics import MetricsMiddleware, registry
+from app.query_stats import QueryStatsMiddleware, install_query_stats
+from app.services.keys import key_store
+from app.services.password_hasher import password_hasher
+from app.services.rate_limit import login_rate_limiter
+from app.services.revocation import token_revocations
+from app.services.token_cleanup import refresh_token_reaper
+from app.services.token_verifier import token_verifier
+from app.services.user_cache import user_cache
 
 
 #Configure logging
@@ -13,6 +26,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: list[asyncio.Task] = []
+
 #Creat Fastapi application
 app = FastAPI(
     title = settings.APP_NAME,
@@ -23,10 +38,32 @@ app = FastAPI(
 
 @app.on_event("startup")
 async def startup_event():
+    #Size the thread pool that runs the synchronous database work
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.DB_THREADPOOL_SIZE
+
+    #Parse the JWT keys once so the first request doesn't pay for it
+    try:
+        key_store.reload()
+    except Exception:
+        logger.warning("JWT keys could not be loaded at startup")
+
+    #Fit the password hash cost to this host before the workers start
+    if settings.PASSWORD_HASH_TARGET_MS > 0:
+        await asyncio.to_thread(password_hasher.calibrate, settings.PASSWORD_HASH_TARGET_MS)
+
+    if settings.TOKEN_REVOCATION_SYNC_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(token_revocations.run_forever()))
+    if settings.REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(refresh_token_reaper.run_forever()))
     logger.info("Application started")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    password_hasher.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
     logger.info("Application stopped")
 
 #CORS Configuration
@@ -38,9 +75,29 @@ app.add_middleware(
     allow_headers = ["*"],
 )
 
+#Request latency and error metrics
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+#Statement counters and slow query log
+install_query_stats(engine)
+if async_engine is not None:
+    install_query_stats(async_engine.sync_engine)
+
+#Subsystem counters published on /metrics
+registry.register_stats("app_token_verifier", token_verifier.stats)
+registry.register_stats("app_password_hasher", password_hasher.stats)
+registry.register_stats("app_db_pool", pool_stats, label="engine")
+registry.register_stats("app_user_cache", user_cache.stats)
+registry.register_stats("app_token_cleanup", refresh_token_reaper.stats)
+registry.register_stats("app_login_rate_limit", login_rate_limiter.stats)
+registry.register_stats("app_token_revocations", token_revocations.stats)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(user_router)
+app.include_router(status_router)
+app.include_router(well_known_router)
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -60,6 +117,13 @@ async def health_check():
     """
     return{"status": "ok"}
 
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics in the Prometheus text format
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
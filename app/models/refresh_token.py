@@ -12,7 +12,13 @@ class RefreshToken(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
-    token = Column(String(1000), nullable=False)
+    #only kept for signed refresh tokens, opaque ones are stored as a hash
+    token = Column(String(1000), nullable=True)
+    token_hash = Column(String(64), unique=True, index=True, nullable=False)
+    #tokens rotated from the same login share a family
+    family_id = Column(String(32), index=True, nullable=True)
+    #token_version of the user when issued, rotation rejects stale versions
+    token_version = Column(Integer, nullable=True)
     expires_at = Column(DateTime(timezone=True), index=True, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, String, Integer, DateTime
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -9,6 +9,10 @@ class User(Base):
     User model for the database
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # keyset pagination order of the admin user list
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -17,8 +21,10 @@ class User(Base):
     full_name = Column(String)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
+    # bumped when tokens already issued must stop validating
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
 
     #Relationship to RefreshToken
     refresh_tokens = relationship("RefreshToken", back_populates="user", lazy="select")
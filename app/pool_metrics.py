@@ -0,0 +1,72 @@
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+class PoolStats:
+    """
+    Counters for connection checkouts of a SQLAlchemy pool
+    """
+    WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.wait_buckets = [0] * (len(self.WAIT_BUCKETS) + 1)
+
+    def observe_wait(self, seconds: float):
+        index = next((i for i, bound in enumerate(self.WAIT_BUCKETS) if seconds <= bound), len(self.WAIT_BUCKETS))
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.wait_buckets[index] += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool: Optional[Pool]) -> dict:
+        """Counters plus the current usage of `pool`"""
+        with self._lock:
+            histogram = {}
+            cumulative = 0
+            for bound, count in zip((*self.WAIT_BUCKETS, "+Inf"), self.wait_buckets):
+                cumulative += count
+                histogram[str(bound)] = cumulative
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds,
+                "wait_seconds_histogram": histogram,
+            }
+
+        #Only queue pools report size and overflow
+        for name in ("size", "checkedout", "checkedin", "overflow"):
+            method = getattr(pool, name, None)
+            if callable(method):
+                data[name] = method()
+        return data
+
+class InstrumentedPoolMixin:
+    """
+    Times how long each checkout waits for a connection
+    """
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_timeout()
+            raise
+        self.stats.observe_wait(time.perf_counter() - start)
+        return connection
+
+def instrumented_pool_class(pool_class: type[Pool], stats: PoolStats) -> type[Pool]:
+    """Subclass `pool_class` so its checkouts are recorded in `stats`"""
+    return type(f"Instrumented{pool_class.__name__}", (InstrumentedPoolMixin, pool_class), {"stats": stats})
@@ -0,0 +1,101 @@
+import contextvars
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+STATEMENTS_PER_REQUEST = registry.histogram(
+    "db_statements_per_request",
+    "SQL statements executed by each request",
+    ("route",),
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50),
+)
+DB_TIME_PER_REQUEST = registry.histogram(
+    "db_time_per_request_seconds",
+    "Time spent executing SQL statements by each request",
+    ("route",),
+)
+SLOW_QUERIES = registry.counter(
+    "db_slow_queries_total",
+    "Statements slower than the slow query threshold",
+    ("route",),
+)
+BUDGET_EXCEEDED = registry.counter(
+    "db_statement_budget_exceeded_total",
+    "Requests that executed more statements than the budget",
+    ("route",),
+)
+
+@dataclass
+class RequestQueryStats:
+    """SQL statements and database time of the current request"""
+    scope: dict = field(repr=False)
+    statements: int = 0
+    seconds: float = 0.0
+
+    @property
+    def route(self) -> str:
+        #the raw path of a 404 would create new series for every url
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+_request_stats: contextvars.ContextVar[Optional[RequestQueryStats]] = contextvars.ContextVar("request_query_stats", default=None)
+
+#the start time lives on the execution context, which is dropped with the
+#statement, so failed statements (no after_cursor_execute) leave nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._query_start
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+
+    if elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS:
+        route = stats.route if stats is not None else "background"
+        SLOW_QUERIES.inc(route)
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, statement)
+
+def install_query_stats(engine: Engine):
+    """Count and time every statement executed through `engine`"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that collects the statements of each request and
+    warns when a request goes over the statement budget
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats(scope)
+        token = _request_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_stats.reset(token)
+            route = stats.route
+            STATEMENTS_PER_REQUEST.observe(stats.statements, route)
+            DB_TIME_PER_REQUEST.observe(stats.seconds, route)
+            if stats.statements > settings.SQL_STATEMENT_BUDGET:
+                BUDGET_EXCEEDED.inc(route)
+                logger.warning(
+                    "%s %s executed %s statements (budget %s, %.1f ms in the database)",
+                    scope["method"], route, stats.statements, settings.SQL_STATEMENT_BUDGET, stats.seconds * 1000
+                )
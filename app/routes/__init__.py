@@ -1,3 +1,5 @@
 #Import
 from app.routes.auth import router as auth_router
-from app.routes.users import router as user_router
\ No newline at end of file
+from app.routes.users import router as user_router
+from app.routes.status import router as status_router
+from app.routes.well_known import router as well_known_router
\ No newline at end of file
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, Request, status, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_session, run_db
 from app.schemas.user import UserCreate
 from app.services.user import create_user
-from app.schemas.auth import Login, Token, ValidateData, TokenRequest, RefreshTokenRequest
+from app.schemas.auth import Login, Token, ValidateData, StatelessValidateData, BatchTokenRequest, SessionRevokeRequest, SessionRevokeResponse, BatchValidateData, TokenRequest, RefreshTokenRequest
+from app.services.auth import validate_token_stateless, token_claims_response, access_token_claims, validate_tokens_batch
 from app.services.auth import generate_user_token, generate_user_login, get_user_token, renovate_access_token, get_current_active_user, user_logout, get_public_key
+from app.services.auth import get_current_admin_user, revoke_sessions
 
 router = APIRouter(
     prefix="/api/auth",
@@ -17,12 +19,12 @@ router = APIRouter(
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register_user(
     user: UserCreate,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     Register a new user in the system
     """
-    db_user = create_user(db, user)
+    db_user = await run_db(create_user, db, user)
     return {
         "message": "Usario creado exitosamente",
         "username": db_user.username,
@@ -30,63 +32,105 @@ async def register_user(
 
 @router.post("/login", response_model=Login, status_code=status.HTTP_200_OK)
 async def user_login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     log in the user and retrieve their athentication token and profile attributes
     """
-    access_token , refresh_token, user = generate_user_login(db,form_data)
+    client_ip = request.client.host if request.client else None
+    access_token , refresh_token, user = await run_db(generate_user_login, db, form_data, client_ip)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer", "user":user}
 
 @router.post("/token", response_model=Token, status_code=status.HTTP_200_OK)
 async def get_token(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     get access token and refresh token
     """
-    
-    access_token , refresh_token = generate_user_token(db, form_data)
+    client_ip = request.client.host if request.client else None
+    access_token , refresh_token = await run_db(generate_user_token, db, form_data, client_ip)
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/validate", response_model=ValidateData, status_code=status.HTTP_200_OK)
 async def validate_token(
     token: TokenRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     recieves and validates user
     """
-    user = get_user_token(db, token)
+    user = await run_db(get_user_token, db, token)
 
     return {"user": user}
 
+@router.post("/validate/batch", response_model=BatchValidateData, status_code=status.HTTP_200_OK)
+async def validate_token_batch(
+    tokens: BatchTokenRequest,
+    db: Session = Depends(get_session)
+):
+    """
+    recieves several access tokens and validates them with one user query
+    """
+    results = await run_db(validate_tokens_batch, db, tokens.access_tokens)
+
+    return {"results": results}
+
+@router.post("/validate/stateless", response_model=StatelessValidateData, status_code=status.HTTP_200_OK)
+async def validate_token_claims(
+    token: TokenRequest,
+    db: Session = Depends(get_session)
+):
+    """
+    validates the token from its signature and claims without querying the database
+    """
+    claims = validate_token_stateless(token)
+    if claims is None:
+        #token issued before the claims existed
+        user = await run_db(get_user_token, db, token)
+        claims = token_claims_response(access_token_claims(user))
+
+    return claims
+
 @router.post("/refresh", response_model=Token, status_code=status.HTTP_200_OK)
 async def get_access_token(
     token: RefreshTokenRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     renovate access token
     """
-    access_token , refresh_token = renovate_access_token(db, token)
+    access_token , refresh_token = await run_db(renovate_access_token, db, token)
 
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
 async def logout_user(
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     logout the user and invalidate all refreshtoken associate to the user
     """
-    user_logout(db, current_user)
+    await run_db(user_logout, db, current_user)
 
     return {"message": "Logout successful"}
 
+@router.post("/sessions/revoke", response_model=SessionRevokeResponse, status_code=status.HTTP_200_OK)
+async def revoke_user_sessions(
+    revoke: SessionRevokeRequest,
+    current_user = Depends(get_current_admin_user),
+    db: Session = Depends(get_session)
+):
+    """
+    revoke in bulk the sessions of a list of users or the ones issued before a date
+    """
+    return await run_db(revoke_sessions, db, revoke.user_ids, revoke.issued_before)
+
 @router.get("/public-key", status_code=status.HTTP_200_OK)
 async def public_key():
     pblc_key = get_public_key()
@@ -0,0 +1,56 @@
+from fastapi import APIRouter, status
+
+from app.database import pool_stats
+from app.services.password_hasher import password_hasher
+from app.services.rate_limit import login_rate_limiter
+from app.services.token_cleanup import refresh_token_reaper
+from app.services.token_verifier import token_verifier
+from app.services.user_cache import user_cache
+
+router = APIRouter(
+    prefix="/status",
+    tags=["Health"],
+    responses={404: {"description": "Not found"}}
+)
+
+@router.get("/token-verifier", status_code=status.HTTP_200_OK)
+async def token_verifier_stats():
+    """
+    Throughput and cache counters of the access token verifier
+    """
+    return token_verifier.stats()
+
+@router.get("/password-hasher", status_code=status.HTTP_200_OK)
+async def password_hasher_stats():
+    """
+    Load of the password hashing process pool
+    """
+    return password_hasher.stats()
+
+@router.get("/pool", status_code=status.HTTP_200_OK)
+async def database_pool_stats():
+    """
+    Checked-out connections, overflow, checkout wait times and timeouts of the database pools
+    """
+    return pool_stats()
+
+@router.get("/token-cleanup", status_code=status.HTTP_200_OK)
+async def token_cleanup_stats():
+    """
+    Rows removed by the refresh token cleanup and size of the table
+    """
+    return refresh_token_reaper.stats()
+
+@router.get("/user-cache", status_code=status.HTTP_200_OK)
+async def user_cache_stats():
+    """
+    Hit and miss counters of the process-local user cache
+    """
+    return user_cache.stats()
+
+@router.get("/login-rate-limit", status_code=status.HTTP_200_OK)
+async def login_rate_limit_stats():
+    """
+    Login attempts counted and shed by the login rate limiter
+    """
+    return login_rate_limiter.stats()
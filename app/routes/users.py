@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Literal, Optional
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_session, run_db
 from app.schemas.auth import UserUpdateResponse
-from app.schemas.user import UserUpdate, UserInfo, UserBase, UserSelfUpdate, ProfileUpdateResponse, PasswordChange, UserListResponse
+from app.schemas.user import UserUpdate, UserInfo, UserBase, UserSelfUpdate, ProfileUpdateResponse, PasswordChange, UserListResponse, UserImportResponse
 from app.services.auth import get_current_admin_user, get_current_active_user
-from app.services.user import user_id_update, get_user_profile, user_profile_update, user_change_password, get_user_list, get_user_by_id
+from app.services.user_import import import_users
+from app.services.user import user_id_update, get_user_profile, user_profile_update, user_change_password, get_user_list, get_user_list_keyset, get_user_by_id, export_users
 
 router = APIRouter(
     prefix="/api/user",
@@ -19,14 +23,14 @@ router = APIRouter(
 async def update_user_info(
     update_info: UserSelfUpdate,
     current_user = Depends(get_current_active_user),
-    db:Session = Depends(get_db),
+    db:Session = Depends(get_session),
 ):
     """
     Permits the user update his username and email
     """
     print("lo que mando: ", update_info)
 
-    user_updated = user_profile_update(update_info, current_user , db)
+    user_updated = await run_db(user_profile_update, update_info, current_user, db)
 
     return {"message": "Profile updated successfully", "user": user_updated}
 
@@ -35,24 +39,24 @@ async def update_user_id(
     user_id: int,
     user_update: UserUpdate,
     current_user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     permits admin update information from an especific user with user_id
     """
-    user = user_id_update(user_id, db, user_update , current_user)
+    user = await run_db(user_id_update, user_id, db, user_update, current_user)
 
     return {"message": "User updated successfully", "user": user}
 
 @router.get("/me", response_model= UserInfo, status_code=status.HTTP_200_OK)
 async def user_profile(
     user = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     get the profile information of the user
     """
-    user_info = get_user_profile(user, db)
+    user_info = await run_db(get_user_profile, user, db)
 
     return user_info
 
@@ -62,34 +66,90 @@ async def user_profile(
 async def change_password(
     passwords: PasswordChange,
     current_user = Depends(get_current_active_user),
-    db:Session = Depends(get_db)
+    db:Session = Depends(get_session)
 ):
     """The User can change his password"""
 
-    user_change_password(passwords, current_user, db)
+    await run_db(user_change_password, passwords, current_user, db)
 
     return {"message": "Password changed successfully"}
 
 @router.get("/", response_model= UserListResponse,status_code=status.HTTP_200_OK)
 async def user_list(
-    page: int,
     limit: int,
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    count: Literal["exact", "estimate", "none"] = "estimate",
     current_user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    users, total = get_user_list(page, limit, current_user, db)
+    """
+    List users. With `page` it uses offset pagination, otherwise it pages
+    by (created_at, id) starting at `cursor` and returns the next and
+    previous cursors. The total is estimated unless `count=exact`.
+    """
+    if page is not None:
+        users, total = await run_db(get_user_list, page, limit, current_user, db)
+        return{"users": users, "pagination":{"page": page, "limit": limit, "total": total}}
+
+    users, next_cursor, prev_cursor, total = await run_db(get_user_list_keyset, cursor, limit, count, db)
+
+    return{"users": users, "pagination":{
+        "limit": limit,
+        "total": total,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }}
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def user_export(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user = Depends(get_current_admin_user),
+):
+    """
+    Stream every user as NDJSON or CSV *Admin only*
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+
+    return StreamingResponse(
+        export_users(format),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=users.{format}"},
+    )
+
+@router.post("/import", response_model=UserImportResponse, status_code=status.HTTP_200_OK)
+async def user_import(
+    file: UploadFile = File(...),
+    format: Optional[Literal["ndjson", "csv"]] = None,
+    current_user = Depends(get_current_admin_user),
+    db: Session = Depends(get_session)
+):
+    """
+    Create users in bulk from a CSV or NDJSON file of up to
+    USER_IMPORT_MAX_ROWS rows *Admin only*
+    """
+    if format is None:
+        format = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+
+    try:
+        content = (await file.read()).decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8"
+        )
 
-    return{"users": users, "pagination":{"page": page, "limit": limit, "total": total}}
+    return await run_db(import_users, db, content, format, settings.USER_IMPORT_BATCH_SIZE, settings.USER_IMPORT_MAX_ROWS)
 
 @router.get("/{user_id}", response_model=UserInfo, status_code=status.HTTP_200_OK)
 async def get_user_info(
     user_id: int,
     user = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     """
     permits an admin user get a user profile with a user_id
     """
-    user_info = get_user_by_id(user_id, db)
+    user_info = await run_db(get_user_by_id, user_id, db)
 
     return user_info
\ No newline at end of file
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Request, Response, status
+
+from app.config import settings
+from app.services.keys import key_store
+
+router = APIRouter(
+    prefix="/.well-known",
+    tags=["Authentication"],
+    responses={404: {"description": "Not found"}}
+)
+
+@router.get("/jwks.json", status_code=status.HTTP_200_OK)
+async def jwks(request: Request):
+    """
+    Public keys that verify the access tokens as a JWK Set, with every key
+    still accepted during a rotation. The body is precomputed when the keys
+    are loaded and can be cached by the clients until it changes.
+    """
+    material = key_store.material
+    headers = {
+        "ETag": material.jwks_etag,
+        "Cache-Control": f"public, max-age={settings.JWKS_MAX_AGE_SECONDS}",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if material.jwks_etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=material.jwks, media_type="application/json", headers=headers)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, EmailStr, Field, field_validator, ConfigDict
+from pydantic import BaseModel, EmailStr, Field, field_validator, model_validator, ConfigDict
+from app.config import settings
 
 class UserBase(BaseModel):
     """Schema for users"""
@@ -62,10 +63,49 @@ class ValidateData(BaseModel):
     """Schema for validate data"""
     user: UserInDB
 
+class StatelessValidateData(BaseModel):
+    """Schema for the claims of a token validated without the database"""
+    user_id: int
+    username: str
+    is_admin: bool
+    is_active: bool
+    token_version: int
+
 class TokenRequest(BaseModel):
     """Schema for access refresh token"""
     access_token: str 
 
+class BatchTokenRequest(BaseModel):
+    """Schema for validating several access tokens"""
+    access_tokens: list[str] = Field(..., min_length=1, max_length=settings.TOKEN_VALIDATE_BATCH_SIZE)
+
+class BatchValidateResult(BaseModel):
+    """Schema for the validation result of one token"""
+    valid: bool
+    user: Optional[UserInDB] = None
+    detail: Optional[str] = None
+
+class BatchValidateData(BaseModel):
+    """Schema for batch validate data, in the order of the request"""
+    results: list[BatchValidateResult]
+
+class SessionRevokeRequest(BaseModel):
+    """Schema for revoking sessions in bulk, by users, by issue date or both"""
+    user_ids: Optional[list[int]] = Field(None, min_length=1, max_length=settings.SESSION_REVOKE_MAX_USERS)
+    issued_before: Optional[datetime] = None
+
+    @model_validator(mode="after")
+    def has_filter(self):
+        if self.user_ids is None and self.issued_before is None:
+            raise ValueError("Se requiere user_ids o issued_before")
+        return self
+
+class SessionRevokeResponse(BaseModel):
+    """Schema for the result of a bulk revocation"""
+    revoked: int
+    batches: int
+    users_updated: int
+
 class RefreshTokenRequest(BaseModel):
     """Schema for access refresh token"""
     refresh_token: str
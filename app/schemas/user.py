@@ -43,11 +43,22 @@ class PasswordChange(BaseModel):
     new_password: str = Field(..., min_length=8)
 
 class Pagination(BaseModel):
-    page: int
+    page: Optional[int] = None
     limit: int
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class UserListResponse(BaseModel):
     users: list[UserInfo]
     pagination: Pagination
 
+class ImportRowIssue(BaseModel):
+    row: int
+    field: Optional[str] = None
+    detail: str
+
+class UserImportResponse(BaseModel):
+    created: int
+    duplicates: list[ImportRowIssue]
+    errors: list[ImportRowIssue]
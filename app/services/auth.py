@@ -1,59 +1,91 @@
+from sqlalchemy import literal, or_, select, update
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from typing import Optional
-from passlib.context import CryptContext
 from fastapi import HTTPException,status, Depends
 from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import secrets
+import uuid
 from jose import JWTError, jwt
 
-from app.database import get_db
+from app.database import get_session, run_db
+from app.metrics import instrumented, registry, timed
 from app.models.user import User
 from app.config import settings
 from app.models.refresh_token import RefreshToken
 from app.schemas.auth import TokenRequest, RefreshTokenRequest
+from app.services.keys import key_store
+from app.services.password_hasher import password_hasher
+from app.services.rate_limit import login_rate_limiter
+from app.services.revocation import token_revocations
+from app.services.token_verifier import token_verifier
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
 
 #OAuth2 configuration
 oauth2_scheme  = OAuth2PasswordBearer(tokenUrl = "api/auth/token")
 
-#configuring bcrypt for password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+REFRESH_TOKEN_REUSE = registry.counter(
+    "auth_refresh_token_reuse_total",
+    "Rotated refresh tokens presented again, each one revokes its family",
+)
 
 def get_password_hash(passsword: str) -> str:
     """generates a hash for the password"""
-    return pwd_context.hash(passsword)
+    return password_hasher.hash(passsword)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Checks if the plaintext password matches the hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
-def authenticate_user(db:Session, username: str, password: str) -> Optional[User]:
-    """Authenticate a user by verifying theier username and password"""
-    user= db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.hashed_password):
+def authenticate_user(db:Session, username: str, password: str, client_ip: Optional[str] = None) -> Optional[User]:
+    """
+    Authenticate a user by verifying theier username and password.
+    Attempts over the login rate limit are rejected before any query or
+    hash. Hashes made with an older scheme or cost are replaced by a new
+    one, which is saved with the next commit of the session.
+    """
+    with timed("rate_limit"):
+        login_rate_limiter.attempt(username, client_ip)
+    with timed("db_query"):
+        user= db.query(User).filter(User.username == username).first()
+    if not user:
         return None
+    with timed("bcrypt_verify"):
+        valid, new_hash = password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    login_rate_limiter.succeeded(username, client_ip)
+    if new_hash:
+        user.hashed_password = new_hash
     return user
 
 def get_private_key():
-    """Read the private key from file"""
-    try:
-        with open(settings.RSA_PRIVATE_KEY_PATH, 'r') as f:
-            return f.read()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error reading private key"
-        )
+    """Return the private key PEM from the in-memory key store"""
+    return key_store.material.private_pem
 
 def get_public_key():
-    """Read the public key from file"""
-    try:
-        with open(settings.RSA_PUBLIC_KEY_PATH, 'r') as f:
-            return f.read()
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Error reading public key"
-        )    
+    """Return the public key PEM from the in-memory key store"""
+    return key_store.material.public_pem
+
+def hash_token(token: str) -> str:
+    """SHA-256 digest used to store and look up refresh tokens"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def access_token_claims(user: User) -> dict:
+    """
+    Claims of an access token, enough to validate it without the database
+    """
+    return {
+        "sub": user.username,
+        "uid": user.id,
+        "adm": bool(user.is_admin),
+        "act": bool(user.is_active),
+        "ver": user.token_version or 0,
+    }
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT token with the provided data"""
@@ -65,46 +97,72 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    private_key = get_private_key()
-    encoded_jwt = jwt.encode(to_encode, private_key, algorithm=settings.ALGORITHM)
+    material = key_store.material
+    with timed("jwt_sign"):
+        encoded_jwt = jwt.encode(to_encode, material.signing_key, algorithm=settings.ALGORITHM, headers={"kid": material.kid})
     
     return encoded_jwt
 
+def sign_tokens(user: User, access_token_expires: timedelta, refresh_token_expires: timedelta) -> tuple[str, str]:
+    """
+    Create the access and refresh tokens of a user in one pass, with one
+    read of the key material and one `jwt_sign` stage for both signatures.
+    The refresh token is a signed JWT or, with REFRESH_TOKEN_MODE=opaque,
+    a random string that is only ever stored as its hash.
+    """
+    now = datetime.now(timezone.utc)
+    material = key_store.material
+    headers = {"kid": material.kid}
+
+    with timed("jwt_sign"):
+        access_token = jwt.encode(
+            dict(access_token_claims(user), exp=now + access_token_expires),
+            material.signing_key, algorithm=settings.ALGORITHM, headers=headers
+        )
+        if settings.REFRESH_TOKEN_MODE == "opaque":
+            refresh_token = secrets.token_urlsafe(32)
+        else:
+            refresh_token = jwt.encode(
+                {"sub": user.username, "jti": uuid.uuid4().hex, "exp": now + refresh_token_expires},
+                material.signing_key, algorithm=settings.ALGORITHM, headers=headers
+            )
+
+    return access_token, refresh_token
+
 def generate_and_store_tokens(
     db: Session,
     user: User,
     access_token_expires: timedelta,
-    refresh_token_expires: timedelta
+    refresh_token_expires: timedelta,
+    family_id: Optional[str] = None
 ) -> tuple[str, str]:
     """
     Generate access and refresh tokens for a user and store the refresh token in the database.
+    Without `family_id` the refresh token starts a new family.
     """
-    access_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=access_token_expires
-    )
-    refresh_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=refresh_token_expires
-    )
+    access_token, refresh_token = sign_tokens(user, access_token_expires, refresh_token_expires)
 
-    db_token = RefreshToken(
+    db.add(RefreshToken(
         user_id=user.id,
-        token=refresh_token,
+        token=refresh_token if settings.REFRESH_TOKEN_MODE == "jwt" else None,
+        token_hash=hash_token(refresh_token),
+        family_id=family_id or uuid.uuid4().hex,
+        token_version=user.token_version or 0,
         expires_at=datetime.now(timezone.utc) + refresh_token_expires
-    )
-
-    db.add(db_token)
-    db.commit()
-    db.refresh(db_token)
+    ))
+    #nothing is read back from the new row, so no refresh after the commit
+    with timed("commit"):
+        db.commit()
 
     return access_token, refresh_token
 
-def generate_user_login(db: Session, form_data: OAuth2PasswordRequestForm) -> tuple[str, str, User]:
+def issue_user_tokens(db: Session, form_data: OAuth2PasswordRequestForm, client_ip: Optional[str] = None) -> tuple[str, str, User]:
     """
-    Authenticate a user and generate access and refresh token and user information
+    Login pipeline shared by /login and /token: rate limit, user query,
+    password check, both signatures, the refresh token INSERT and a single
+    commit, which also saves a rehashed password
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = authenticate_user(db, form_data.username, form_data.password, client_ip)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -128,45 +186,42 @@ def generate_user_login(db: Session, form_data: OAuth2PasswordRequestForm) -> tu
 
     return access_token, refresh_token, user
 
-def generate_user_token(db: Session, form_data: OAuth2PasswordRequestForm) -> tuple[str, str]:
+@instrumented("generate_user_login")
+def generate_user_login(db: Session, form_data: OAuth2PasswordRequestForm, client_ip: Optional[str] = None) -> tuple[str, str, User]:
     """
-    Authenticate a user and generate access and refresh token
+    Authenticate a user and generate access and refresh token and user information
     """
+    return issue_user_tokens(db, form_data, client_ip)
 
-    user = authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Nombre de usuario o contraseña incorrectos",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    if not user.is_active:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario desactivado",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    refresh_token_expires = timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS)
-
-    access_token, refresh_token = generate_and_store_tokens(
-        db, user, access_token_expires, refresh_token_expires
-    )
-
+@instrumented("generate_user_token")
+def generate_user_token(db: Session, form_data: OAuth2PasswordRequestForm, client_ip: Optional[str] = None) -> tuple[str, str]:
+    """
+    Authenticate a user and generate access and refresh token
+    """
+    access_token, refresh_token, _ = issue_user_tokens(db, form_data, client_ip)
     return access_token, refresh_token
 
+def token_matches_user(claims: dict, user: User) -> bool:
+    """
+    Whether an access token still stands for `user`: issued for its id and
+    current `token_version` and not revoked by another worker, see
+    access_token_claims. Tokens from before the claims carry none of them.
+    """
+    if "uid" in claims and claims["uid"] != user.id:
+        return False
+    if claims.get("ver", 0) < (user.token_version or 0):
+        return False
+    return "uid" not in claims or not token_revocations.is_revoked(claims)
+
 def get_user_token(db: Session, token: TokenRequest) -> User:
     try:
         acces_token = token.access_token
-        private_key = get_private_key()
-        decoded_jwt = jwt.decode(acces_token, private_key, algorithms=settings.ALGORITHM)
+        decoded_jwt = token_verifier.verify(acces_token)
         sub = decoded_jwt.get("sub")
 
         user= db.query(User).filter(User.username == sub).first()
 
-        if not user or not user.is_active:
+        if not user or not user.is_active or not token_matches_user(decoded_jwt, user):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="El token no es válido",
@@ -181,67 +236,195 @@ def get_user_token(db: Session, token: TokenRequest) -> User:
                 headers={"WWW-Authenticate": "Bearer"},
         )
 
-def renovate_access_token(db:Session , token: RefreshTokenRequest) -> tuple[str, str]:
+@instrumented("validate_tokens_batch")
+def validate_tokens_batch(db: Session, tokens: list[str]) -> list[dict]:
+    """
+    Validate many access tokens at once. Signatures are checked with the
+    cached verifier and every referenced user is loaded with a single
+    `WHERE username IN (...)` query. Results keep the order of `tokens`.
+    """
+    claims_list: list[Optional[dict]] = []
+    for access_token in tokens:
+        try:
+            with timed("jwt_verify"):
+                claims_list.append(token_verifier.verify(access_token))
+        except JWTError:
+            claims_list.append(None)
+
+    wanted = {claims.get("sub") for claims in claims_list if claims and claims.get("sub")}
+    users = {}
+    if wanted:
+        with timed("db_query"):
+            users = {
+                user.username: user
+                for user in db.query(User).filter(User.username.in_(wanted)).all()
+            }
+
+    results = []
+    for claims in claims_list:
+        user = users.get(claims.get("sub")) if claims else None
+        if user is None or not user.is_active or not token_matches_user(claims, user):
+            results.append({"valid": False, "user": None, "detail": "El token no es válido"})
+        else:
+            results.append({"valid": True, "user": user, "detail": None})
+    return results
+
+@instrumented("validate_token_stateless")
+def validate_token_stateless(token: TokenRequest) -> Optional[dict]:
+    """
+    Validate an access token from its signature and claims only.
 
-    refresh_token_request = token.refresh_token
+    Deactivations and version bumps are checked against the in-memory
+    revocation set, so no query is issued. Returns None for tokens issued
+    before the claims were added, which must be validated with the database.
+    """
+    try:
+        with timed("jwt_verify"):
+            claims = token_verifier.verify(token.access_token)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="El token no es válido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    db_refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == refresh_token_request,
-        RefreshToken.is_active == True                                           
-        ).first()
+    if "uid" not in claims:
+        return None
 
-    if not db_refresh_token:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="El  refresh token no es valido o no esta activo",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+    return token_claims_response(claims)
 
-    private_key = get_private_key()
-    decoded_jwt = jwt.decode(refresh_token_request, private_key, algorithms=settings.ALGORITHM)
-    sub = decoded_jwt.get("sub")
+def token_claims_response(claims: dict) -> dict:
+    """Check the claims against the revocation set and build the validation response"""
+    if token_revocations.is_revoked(claims):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="El token no es válido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
-    user= db.query(User).filter(User.username == sub).first()
+    return {
+        "user_id": claims["uid"],
+        "username": claims["sub"],
+        "is_admin": claims["adm"],
+        "is_active": claims["act"],
+        "token_version": claims["ver"],
+    }
+
+def revoke_refresh_token_family(db: Session, family_id: str) -> int:
+    """Deactivate every active refresh token of a family, returns the rows updated"""
+    revoked = db.query(RefreshToken).filter(
+        RefreshToken.family_id == family_id,
+        RefreshToken.is_active == True
+    ).update(
+        {RefreshToken.is_active: False, RefreshToken.revoked_at: datetime.now(timezone.utc)},
+        synchronize_session=False
+    )
+    db.commit()
+    return revoked
 
-    if not user or not user.is_active:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="El token no es válido",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-    
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    refresh_token_expires = timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS)
+#user columns needed to sign the new tokens, see access_token_claims
+ROTATION_USER_COLUMNS = (User.id, User.username, User.is_admin, User.is_active, User.token_version)
 
-    access_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=access_token_expires
+def claim_refresh_token(db: Session, token_hash: str):
+    """
+    Deactivate an active, unexpired refresh token of an active user with a
+    single conditional UPDATE and return its family and user columns, or
+    None when it can't be used. Only one of several concurrent claims of
+    the same token can match the row. Tokens issued before the user's
+    `token_version` was bumped are rejected, tokens stored without a
+    version are accepted.
+    """
+    #checked against the users row joined or correlated by the claim
+    user_is_current = (
+        User.is_active == True,
+        or_(RefreshToken.token_version.is_(None), RefreshToken.token_version == User.token_version),
     )
-    refresh_token = create_access_token(
-        data={"sub": user.username},
-        expires_delta=refresh_token_expires
+    claim = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.is_active == True,
+            RefreshToken.expires_at > datetime.now(timezone.utc),
+        )
+        .values(is_active=False)
+        .execution_options(synchronize_session=False)
     )
+
+    if db.get_bind().dialect.name == "postgresql":
+        #UPDATE ... FROM users ... RETURNING the user in the same round trip
+        return db.execute(
+            claim.where(RefreshToken.user_id == User.id, *user_is_current)
+            .returning(RefreshToken.family_id, *ROTATION_USER_COLUMNS)
+        ).first()
+
+    #SQLite can't return columns of the FROM tables, the user is checked in
+    #the UPDATE so an inactive user never leaves a deactivated token behind
+    claimed = db.execute(
+        claim.where(select(User.id).where(User.id == RefreshToken.user_id, *user_is_current).exists())
+        .returning(RefreshToken.family_id, RefreshToken.user_id)
+    ).first()
+    if claimed is None:
+        return None
+    return db.execute(
+        select(literal(claimed.family_id).label("family_id"), *ROTATION_USER_COLUMNS)
+        .where(User.id == claimed.user_id)
+    ).first()
+
+@instrumented("renovate_access_token")
+def renovate_access_token(db:Session , token: RefreshTokenRequest) -> tuple[str, str]:
+    """
+    Rotate a refresh token.
+
+    The old token is claimed with one conditional UPDATE that also loads
+    the user, and the new token is inserted in the same transaction: two
+    round trips and one commit, no signature check since the stored hash
+    proves the token was issued by us. A token that was already rotated,
+    including by a concurrent refresh, is treated as stolen and revokes
+    every token of its family.
+    """
+    token_hash = hash_token(token.refresh_token)
+
+    with timed("db_query"):
+        claimed = claim_refresh_token(db, token_hash)
+
+    if claimed is None:
+        with timed("db_query"):
+            db_refresh_token = db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).first()
+
+        #rotated tokens are deactivated without revoked_at, revoked ones were already handled
+        if db_refresh_token and not db_refresh_token.is_active and db_refresh_token.revoked_at is None and db_refresh_token.family_id:
+            REFRESH_TOKEN_REUSE.inc()
+            with timed("commit"):
+                revoked = revoke_refresh_token_family(db, db_refresh_token.family_id)
+            logger.warning(
+                "Reused refresh token for user %s, revoked %s tokens of its family",
+                db_refresh_token.user_id, revoked
+            )
+        else:
+            db.rollback()
+
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="El  refresh token no es valido o no esta activo",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    db_refresh_token.is_active = False
-    
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    refresh_token_expires = timedelta(hours=settings.REFRESH_TOKEN_EXPIRE_HOURS)
 
-    db_token = RefreshToken(
-        user_id=user.id,
-        token=refresh_token,
-        expires_at=datetime.now(timezone.utc) + refresh_token_expires
+    #the claimed row carries the user columns access_token_claims reads
+    access_token, refresh_token = generate_and_store_tokens(
+        db, claimed, access_token_expires, refresh_token_expires, family_id=claimed.family_id
     )
 
-    db.add(db_token)
-    db.commit()
-    db.refresh(db_token)
-
     return access_token, refresh_token
 
+@instrumented("get_current_user")
 def get_current_user(db:Session, token: str) -> User:
     
     try:
-        private_key = get_private_key()
-        decoded_jwt = jwt.decode(token, private_key, algorithms=settings.ALGORITHM)
+        with timed("jwt_verify"):
+            decoded_jwt = token_verifier.verify(token)
         username = decoded_jwt.get("sub")
 
         if not username:
@@ -256,16 +439,27 @@ def get_current_user(db:Session, token: str) -> User:
               detail="token invalido"
          ) 
     
-    user= db.query(User).filter(User.username == username).first()
+    user = user_cache.get_by_username(db, username)
+    if user is None:
+        with timed("db_query"):
+            user = db.query(User).filter(User.username == username).first()
+        if user:
+            user_cache.put(user)
+
+    if user and not token_matches_user(decoded_jwt, user):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="token invalido"
+        )
     
     return user
 
-def get_current_active_user(
+async def get_current_active_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
     ) -> User:
 
-    current_user = get_current_user(db,token)
+    current_user = await run_db(get_current_user, db, token)
 
     if not current_user or not current_user.is_active:
             raise HTTPException(
@@ -276,12 +470,12 @@ def get_current_active_user(
 
     return current_user
 
-def get_current_admin_user(
+async def get_current_admin_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
     ) -> User:
 
-    current_user = get_current_user(db,token)
+    current_user = await run_db(get_current_user, db, token)
 
     if not current_user or not current_user.is_active:
             raise HTTPException(
@@ -300,22 +494,112 @@ def get_current_admin_user(
     return current_user
     
 def user_logout(db: Session, current_user: User):
-
-    refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.user_id == current_user.id,
-        RefreshToken.is_active == True 
-        ).all()
+    """Revoke every active refresh token of the user with a single UPDATE"""
+    with timed("db_query"):
+        revoked = db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == current_user.id, RefreshToken.is_active == True)
+            .values(is_active=False, revoked_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        ).rowcount
     
-    if not refresh_token:
+    if not revoked:
+        db.rollback()
         raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="token inválido o no existe",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-    
-    for token in refresh_token:
-        token.is_active = False
-        token.revoked_at = datetime.now(timezone.utc)
 
-    db.commit()
-    return
\ No newline at end of file
+    with timed("commit"):
+        db.commit()
+    user_cache.invalidate(current_user.id)
+    return
+
+@instrumented("revoke_sessions")
+def revoke_sessions(
+    db: Session,
+    user_ids: Optional[list[int]] = None,
+    issued_before: Optional[datetime] = None,
+    batch_size: int = settings.SESSION_REVOKE_BATCH_SIZE
+) -> dict:
+    """
+    Revoke the active refresh tokens of `user_ids`, issued before
+    `issued_before`, or matching both, in batches of `batch_size` rows.
+
+    The listed users are handled SESSION_REVOKE_MAX_USERS at a time: their
+    `token_version` is bumped first, which makes every access token
+    check reject their tokens (see token_matches_user) and stops any
+    refresh token of theirs from rotating, and then their refresh tokens
+    are deactivated. With only `issued_before` the access tokens expire
+    on their own.
+
+    The tokens are walked in id order: each batch locks the next
+    `batch_size` matching ids after the previous batch with FOR UPDATE,
+    deactivates them with one UPDATE over that id range and commits, so
+    a mass logout never holds long locks and never scans the rows earlier
+    batches already revoked.
+    """
+    now = datetime.now(timezone.utc)
+    conditions = [RefreshToken.is_active == True]
+    if issued_before is not None:
+        if issued_before.tzinfo is None:
+            issued_before = issued_before.replace(tzinfo=timezone.utc)
+        issued_before = issued_before.astimezone(timezone.utc)
+        conditions.append(RefreshToken.created_at < issued_before)
+
+    if user_ids:
+        chunk_size = settings.SESSION_REVOKE_MAX_USERS
+        user_chunks = [user_ids[index:index + chunk_size] for index in range(0, len(user_ids), chunk_size)]
+    else:
+        user_chunks = [None]
+
+    revoked = 0
+    batches = 0
+    users_updated = 0
+    for chunk in user_chunks:
+        chunk_conditions = conditions
+        if chunk is not None:
+            with timed("db_query"):
+                rows = db.execute(
+                    update(User)
+                    .where(User.id.in_(chunk))
+                    .values(token_version=User.token_version + 1)
+                    .returning(User.id, User.token_version, User.is_active)
+                    .execution_options(synchronize_session=False)
+                ).all()
+            with timed("commit"):
+                db.commit()
+            for user_id, token_version, is_active in rows:
+                user_cache.invalidate(user_id)
+                token_revocations.mark(user_id, token_version, bool(is_active))
+            users_updated += len(rows)
+            chunk_conditions = conditions + [RefreshToken.user_id.in_(chunk)]
+
+        last_id = 0
+        while True:
+            with timed("db_query"):
+                ids = db.execute(
+                    select(RefreshToken.id)
+                    .where(*chunk_conditions, RefreshToken.id > last_id)
+                    .order_by(RefreshToken.id)
+                    .limit(batch_size)
+                    .with_for_update()
+                ).scalars().all()
+            if not ids:
+                db.commit()
+                break
+            with timed("db_query"):
+                updated = db.execute(
+                    update(RefreshToken)
+                    .where(RefreshToken.id.between(ids[0], ids[-1]), *chunk_conditions)
+                    .values(is_active=False, revoked_at=now)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+            with timed("commit"):
+                db.commit()
+            last_id = ids[-1]
+            revoked += updated
+            batches += 1
+
+    return {"revoked": revoked, "batches": batches, "users_updated": users_updated}
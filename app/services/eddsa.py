@@ -0,0 +1,115 @@
+import base64
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWKError
+
+EDDSA = "EdDSA"
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+class Ed25519Key(Key):
+    """
+    Ed25519 key for the `EdDSA` JWS algorithm (RFC 8037), which python-jose
+    does not implement. Accepts PEM data, an OKP JWK or a cryptography key.
+    """
+
+    def __init__(self, key, algorithm):
+        if algorithm != EDDSA:
+            raise JWKError("%s is not a valid Ed25519 algorithm" % algorithm)
+        self._algorithm = algorithm
+
+        if isinstance(key, (Ed25519PrivateKey, Ed25519PublicKey)):
+            self.prepared_key = key
+            return
+
+        if isinstance(key, dict):
+            self.prepared_key = self._process_jwk(key)
+            return
+
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+
+        if isinstance(key, bytes):
+            try:
+                try:
+                    key = serialization.load_pem_public_key(key)
+                except ValueError:
+                    key = serialization.load_pem_private_key(key, password=None)
+            except Exception as e:
+                raise JWKError(e)
+            if not isinstance(key, (Ed25519PrivateKey, Ed25519PublicKey)):
+                raise JWKError("Not an Ed25519 key")
+            self.prepared_key = key
+            return
+
+        raise JWKError("Unable to parse an Ed25519Key from key: %s" % key)
+
+    @staticmethod
+    def _process_jwk(jwk_dict: dict):
+        if jwk_dict.get("kty") != "OKP" or jwk_dict.get("crv") != "Ed25519":
+            raise JWKError("Incorrect key type. Expected: 'OKP' with crv 'Ed25519'")
+        if "d" in jwk_dict:
+            return Ed25519PrivateKey.from_private_bytes(_b64decode(jwk_dict["d"]))
+        return Ed25519PublicKey.from_public_bytes(_b64decode(jwk_dict["x"]))
+
+    def is_public(self) -> bool:
+        return isinstance(self.prepared_key, Ed25519PublicKey)
+
+    def sign(self, msg: bytes) -> bytes:
+        if self.is_public():
+            raise JWKError("A private key is required to sign")
+        return self.prepared_key.sign(msg)
+
+    def verify(self, msg: bytes, sig: bytes) -> bool:
+        public_key = self.prepared_key if self.is_public() else self.prepared_key.public_key()
+        try:
+            public_key.verify(sig, msg)
+            return True
+        except InvalidSignature:
+            return False
+
+    def public_key(self) -> "Ed25519Key":
+        if self.is_public():
+            return self
+        return type(self)(self.prepared_key.public_key(), self._algorithm)
+
+    def to_pem(self) -> bytes:
+        if self.is_public():
+            return self.prepared_key.public_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        return self.prepared_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        )
+
+    def to_dict(self) -> dict:
+        public_key = self.prepared_key if self.is_public() else self.prepared_key.public_key()
+        data = {
+            "alg": self._algorithm,
+            "kty": "OKP",
+            "crv": "Ed25519",
+            "x": _b64encode(public_key.public_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PublicFormat.Raw,
+            )),
+        }
+        if not self.is_public():
+            data["d"] = _b64encode(self.prepared_key.private_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PrivateFormat.Raw,
+                encryption_algorithm=serialization.NoEncryption(),
+            ))
+        return data
+
+jwk.register_key(EDDSA, Ed25519Key)
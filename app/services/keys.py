@@ -0,0 +1,222 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import HTTPException, status
+from jose import jwk
+from jose.backends.base import Key
+
+from app.config import settings
+from app.services.eddsa import EDDSA
+
+logger = logging.getLogger(__name__)
+
+#members of each key type hashed by the RFC 7638 thumbprint
+THUMBPRINT_MEMBERS = {
+    "RSA": ("e", "kty", "n"),
+    "EC": ("crv", "kty", "x", "y"),
+    "OKP": ("crv", "kty", "x"),
+}
+
+def jwk_thumbprint(public_jwk: dict) -> str:
+    """RFC 7638 SHA-256 thumbprint of a public JWK, used as its `kid`"""
+    members = {name: public_jwk[name] for name in THUMBPRINT_MEMBERS[public_jwk["kty"]]}
+    canonical = json.dumps(members, separators=(",", ":"), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(hashlib.sha256(canonical).digest()).rstrip(b"=").decode()
+
+#JWS algorithm of the retired public keys, by curve for EC keys
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+def public_key_algorithm(public_pem: str) -> str:
+    """JWS algorithm of a public key PEM, RSA keys are assumed to be RS256"""
+    public_key = serialization.load_pem_public_key(public_pem.encode())
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return EDDSA
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return EC_ALGORITHMS[public_key.curve.name]
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    raise ValueError("Unsupported public key type")
+
+def derive_public_pem(private_pem: str, public_pem: str) -> str:
+    """
+    Public key PEM of `private_pem`, checked against `public_pem` so a
+    private key is never paired with the public key of another pair, e.g.
+    when the files are read in the middle of a rotation.
+    """
+    public_key = serialization.load_pem_private_key(private_pem.encode(), password=None).public_key()
+    der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    stored = serialization.load_pem_public_key(public_pem.encode())
+    if stored.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo) != der:
+        raise ValueError("The public key doesn't belong to the private key")
+    return public_key.public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode()
+
+@dataclass(frozen=True)
+class KeyMaterial:
+    """
+    Parsed key pair used to sign JWTs, plus every public key that still
+    verifies them. `jwks` is the serialized JWK Set and `jwks_etag` its
+    strong ETag, both computed once per load. `algorithms` maps every
+    `kid` to the only algorithm its key may verify.
+    """
+    private_pem: str
+    public_pem: str
+    signing_key: Key
+    verifying_key: Key
+    kid: str
+    verifying_keys: dict[str, Key]
+    algorithms: dict[str, str]
+    jwks: bytes
+    jwks_etag: str
+    mtimes: tuple
+    version: int
+
+class KeyStore:
+    """
+    Keeps the JWT keys parsed in memory.
+
+    The PEM files are read once; after that the store only checks their
+    modification time every `reload_interval` seconds and swaps in a new
+    `KeyMaterial` when they change, so signing and verifying never touch
+    the filesystem on the hot path. Files that don't form a key pair, as
+    seen halfway through a rotation, keep the previous keys until the
+    next check.
+
+    Public keys found in `public_keys_dir` are published in the JWK Set and
+    accepted for verification next to the current key, so tokens signed
+    with a retired key keep working while a rotation is rolled out. The
+    retired keys may use another algorithm than `algorithm`, which is how
+    RS256 tokens keep verifying after moving to ES256 or EdDSA.
+    """
+
+    def __init__(
+        self,
+        private_key_path: str,
+        public_key_path: str,
+        algorithm: str,
+        reload_interval: int,
+        public_keys_dir: Optional[str] = None,
+    ):
+        self.private_key_path = private_key_path
+        self.public_key_path = public_key_path
+        self.public_keys_dir = public_keys_dir
+        self.algorithm = algorithm
+        self.reload_interval = reload_interval
+        self._material: Optional[KeyMaterial] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def material(self) -> KeyMaterial:
+        """Current key material, reloading it from disk if the files changed"""
+        material = self._material
+        if material is None or (self.reload_interval > 0 and time.monotonic() >= self._next_check):
+            material = self._refresh()
+        return material
+
+    def reload(self) -> KeyMaterial:
+        """Force a reload of the PEM files"""
+        with self._lock:
+            self._next_check = time.monotonic() + self.reload_interval
+            self._material = self._load()
+            return self._material
+
+    def _refresh(self) -> KeyMaterial:
+        with self._lock:
+            material = self._material
+            now = time.monotonic()
+            if material is not None and now < self._next_check:
+                return material
+            self._next_check = now + self.reload_interval
+
+            if material is None:
+                self._material = self._load()
+                return self._material
+
+            try:
+                if self._mtimes() != material.mtimes:
+                    self._material = self._load()
+                    logger.info("JWT keys reloaded (version %s)", self._material.version)
+            except Exception:
+                #Keep serving the previous keys if the new files can't be read
+                logger.exception("Error reloading JWT keys, keeping version %s", material.version)
+
+            return self._material
+
+    def _extra_key_paths(self) -> list[str]:
+        if not self.public_keys_dir or not os.path.isdir(self.public_keys_dir):
+            return []
+        return sorted(
+            os.path.join(self.public_keys_dir, name)
+            for name in os.listdir(self.public_keys_dir)
+            if name.endswith(".pem")
+        )
+
+    def _mtimes(self) -> tuple:
+        paths = [self.private_key_path, self.public_key_path] + self._extra_key_paths()
+        return tuple((path, os.stat(path).st_mtime) for path in paths)
+
+    def _load(self) -> KeyMaterial:
+        try:
+            mtimes = self._mtimes()
+            with open(self.private_key_path, 'r') as f:
+                private_pem = f.read()
+            with open(self.public_key_path, 'r') as f:
+                public_pem = f.read()
+            signing_key = jwk.construct(private_pem, self.algorithm)
+            #the kid is derived from the private key, public.pem must match it
+            verifying_key = jwk.construct(derive_public_pem(private_pem, public_pem), self.algorithm)
+
+            kid = jwk_thumbprint(verifying_key.to_dict())
+            verifying_keys = {kid: verifying_key}
+            algorithms = {kid: self.algorithm}
+            public_jwks = [dict(verifying_key.to_dict(), kid=kid, use="sig")]
+            for path in self._extra_key_paths():
+                with open(path, 'r') as f:
+                    pem = f.read()
+                algorithm = public_key_algorithm(pem)
+                key = jwk.construct(pem, algorithm)
+                key_id = jwk_thumbprint(key.to_dict())
+                if key_id not in verifying_keys:
+                    verifying_keys[key_id] = key
+                    algorithms[key_id] = algorithm
+                    public_jwks.append(dict(key.to_dict(), kid=key_id, use="sig"))
+        except Exception:
+            logger.exception("Error loading JWT keys")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error reading keys"
+            )
+
+        jwks = json.dumps({"keys": public_jwks}, separators=(",", ":"), sort_keys=True).encode()
+        version = self._material.version + 1 if self._material else 1
+        return KeyMaterial(
+            private_pem=private_pem,
+            public_pem=public_pem,
+            signing_key=signing_key,
+            verifying_key=verifying_key,
+            kid=kid,
+            verifying_keys=verifying_keys,
+            algorithms=algorithms,
+            jwks=jwks,
+            jwks_etag='"' + hashlib.sha256(jwks).hexdigest()[:32] + '"',
+            mtimes=mtimes,
+            version=version,
+        )
+
+#global key store used by the token services
+key_store = KeyStore(
+    private_key_path=settings.RSA_PRIVATE_KEY_PATH,
+    public_key_path=settings.RSA_PUBLIC_KEY_PATH,
+    algorithm=settings.ALGORITHM,
+    reload_interval=settings.KEY_RELOAD_INTERVAL_SECONDS,
+    public_keys_dir=settings.PUBLIC_KEYS_DIR,
+)
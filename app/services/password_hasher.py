@@ -0,0 +1,270 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMES = ("bcrypt", "argon2")
+#lowest costs calibration may pick, whatever the target
+MIN_BCRYPT_ROUNDS = 10
+MIN_ARGON2_TIME_COST = 1
+
+def hash_config_from_settings() -> dict:
+    return {
+        "scheme": settings.PASSWORD_HASH_SCHEME,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "argon2_time_cost": settings.ARGON2_TIME_COST,
+        "argon2_memory_cost": settings.ARGON2_MEMORY_COST,
+        "argon2_parallelism": settings.ARGON2_PARALLELISM,
+    }
+
+def build_context(config: dict) -> CryptContext:
+    """
+    CryptContext hashing with the configured scheme and cost. Hashes made
+    with the other scheme or with a lower cost still verify but are
+    reported as needing an update.
+    """
+    scheme = config["scheme"]
+    if scheme not in SCHEMES:
+        raise ValueError(f"Unknown password hash scheme: {scheme}")
+    if scheme == "argon2":
+        from passlib.hash import argon2
+        if not argon2.has_backend():
+            raise RuntimeError("PASSWORD_HASH_SCHEME=argon2 requires the argon2-cffi package")
+
+    return CryptContext(
+        schemes=[scheme] + [other for other in SCHEMES if other != scheme],
+        deprecated="auto",
+        bcrypt__default_rounds=config["bcrypt_rounds"],
+        bcrypt__min_rounds=config["bcrypt_rounds"],
+        argon2__type="ID",
+        argon2__default_rounds=config["argon2_time_cost"],
+        argon2__min_rounds=config["argon2_time_cost"],
+        argon2__memory_cost=config["argon2_memory_cost"],
+        argon2__parallelism=config["argon2_parallelism"],
+    )
+
+#configured context of this process, the pool workers build theirs in _configure
+pwd_context = build_context(hash_config_from_settings())
+
+def _configure(config: dict):
+    global pwd_context
+    pwd_context = build_context(config)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _hash_many(passwords: list[str]) -> list[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+def _hash_seconds(config: dict) -> float:
+    context = build_context(config)
+    start = time.perf_counter()
+    context.hash("calibration password")
+    return time.perf_counter() - start
+
+def calibrate(config: dict, target_ms: float) -> dict:
+    """
+    Return `config` with the highest cost whose hash takes at most
+    `target_ms` on this host. bcrypt doubles its time per round, argon2
+    grows linearly with its time cost at a fixed memory and parallelism.
+    """
+    target = target_ms / 1000
+    config = dict(config)
+    if config["scheme"] == "argon2":
+        elapsed = min(_hash_seconds(dict(config, argon2_time_cost=1)) for _ in range(3))
+        config["argon2_time_cost"] = max(MIN_ARGON2_TIME_COST, int(target / elapsed))
+    else:
+        probe_rounds = 8
+        elapsed = min(_hash_seconds(dict(config, bcrypt_rounds=probe_rounds)) for _ in range(3))
+        rounds = probe_rounds + math.floor(math.log2(target / elapsed))
+        config["bcrypt_rounds"] = min(31, max(MIN_BCRYPT_ROUNDS, rounds))
+    return config
+
+class PasswordHasherPool:
+    """
+    Runs the password hashing in a bounded process pool.
+
+    At most `workers + queue_size` operations can be running or waiting at
+    the same time; callers that can't get a slot within `queue_timeout`
+    seconds get an HTTP 503 instead of piling up behind the pool.
+    With `workers=0` the hashing runs inline in the calling thread.
+
+    When called from a service running on an AsyncSession (inside the
+    SQLAlchemy greenlet on the event loop) the waits are awaited instead
+    of blocking the loop.
+
+    The scheme and cost are given by `config`; the workers receive it through
+    the pool initializer and `configure` restarts them when it changes.
+    """
+
+    def __init__(self, workers: int, queue_size: int, queue_timeout: float, config: dict):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.config = dict(config)
+        self._slots = threading.BoundedSemaphore(max(workers, 1) + queue_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self._run(_verify, plain_password, hashed_password)
+
+    def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+        """Verify a password and return a new hash when the stored one is outdated"""
+        return self._run(_verify_and_update, plain_password, hashed_password)
+
+    def hash_many(self, passwords: list[str], chunk_size: int = 16) -> list[str]:
+        """
+        Hash a list of passwords in parallel across the pool.
+
+        Chunks are sent to the workers with at most one chunk per worker in
+        flight, leaving one worker free for logins when there is more than
+        one. Each chunk holds a single slot, so bulk jobs wait for capacity
+        instead of failing and logins can still get a slot in between.
+        """
+        window = max(self.workers - 1, 1)
+        pending: deque[Future] = deque()
+        hashes: list[str] = []
+
+        for index in range(0, len(passwords), chunk_size):
+            if len(pending) >= window:
+                hashes.extend(self._wait(pending.popleft()))
+            pending.append(self._submit(_hash_many, passwords[index:index + chunk_size], timeout=None))
+
+        while pending:
+            hashes.extend(self._wait(pending.popleft()))
+        return hashes
+
+    def configure(self, config: dict):
+        """Switch the scheme or cost, new workers are started with it"""
+        _configure(config)
+        with self._lock:
+            self.config = dict(config)
+        self.shutdown()
+
+    def calibrate(self, target_ms: float) -> dict:
+        """Pick the cost that takes about `target_ms` on this host and apply it"""
+        config = calibrate(self.config, target_ms)
+        self.configure(config)
+        logger.info(
+            "Password hashing calibrated to %s ms: %s",
+            target_ms, {key: value for key, value in config.items() if key.startswith(config["scheme"])}
+        )
+        return config
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "scheme": self.config["scheme"],
+                "bcrypt_rounds": self.config["bcrypt_rounds"],
+                "argon2_time_cost": self.config["argon2_time_cost"],
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def _run(self, func, *args):
+        return self._wait(self._submit(func, *args, timeout=self.queue_timeout))
+
+    def _submit(self, func, *args, timeout: Optional[float]) -> Future:
+        if not self._acquire_slot(timeout):
+            with self._lock:
+                self._rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, intente más tarde",
+                headers={"Retry-After": "1"},
+            )
+
+        with self._lock:
+            self._in_flight += 1
+        try:
+            if self.workers > 0:
+                future = self._get_executor().submit(func, *args)
+            else:
+                future = Future()
+                try:
+                    if in_greenlet():
+                        future.set_result(await_only(asyncio.to_thread(func, *args)))
+                    else:
+                        future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        except BaseException:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    def _wait(self, future: Future):
+        if in_greenlet():
+            return await_only(asyncio.wrap_future(future))
+        return future.result()
+
+    def _release(self, future: Optional[Future] = None):
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None:
+                self._completed += 1
+        self._slots.release()
+
+    def _acquire_slot(self, timeout: Optional[float]) -> bool:
+        if self._slots.acquire(blocking=False):
+            return True
+        if in_greenlet():
+            return await_only(asyncio.to_thread(self._slots.acquire, timeout=timeout))
+        return self._slots.acquire(timeout=timeout)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                #spawn avoids forking a process that already runs threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_configure,
+                    initargs=(self.config,),
+                )
+            return self._executor
+
+#global pool used by the auth services
+password_hasher = PasswordHasherPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+    config=hash_config_from_settings(),
+)
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MemoryRateLimitBackend:
+    """
+    Sliding window counters kept in this process.
+
+    Each key keeps the count of the current and the previous fixed window;
+    the previous one is weighted by how much of it still overlaps the
+    sliding window. The keys are kept in the order they were last touched,
+    so the ones whose windows are over are dropped from the front as they
+    go stale, each one once.
+
+    At most `max_keys` keys are tracked. A new key evicts the least
+    recently touched one among the first `EVICTION_CANDIDATES` that is
+    still under its limit; keys at their limit are never evicted, that
+    would let many distinct keys flush the counter of the one under
+    attack. When every candidate is at its limit the new key is refused
+    and its attempt treated as over the limit.
+    """
+
+    #only takes a lock, safe to call on the event loop
+    blocking = False
+
+    EVICTION_CANDIDATES = 16
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        #key -> [window index, current count, previous count, limit]
+        self._counters: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+        self._refused = 0
+
+    def hit(self, key: str, window: int, limit: float = math.inf) -> float:
+        """Count an attempt and return the attempts in the sliding window"""
+        now = time.time()
+        index = int(now // window)
+        weight = 1 - (now % window) / window
+        with self._lock:
+            self._drop_stale(index)
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_keys and not self._evict(index, weight):
+                    self._refused += 1
+                    return math.inf
+                counter = self._counters[key] = [index, 0, 0, limit]
+            else:
+                self._roll(key, counter, index)
+                counter[3] = limit
+            counter[1] += 1
+            return counter[2] * weight + counter[1]
+
+    def undo(self, key: str, window: int):
+        """Forget one attempt of the current window"""
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is not None:
+                self._roll(key, counter, int(time.time() // window))
+                counter[1] = max(0, counter[1] - 1)
+
+    def reset(self, key: str, window: int):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._counters)
+
+    def refused(self) -> int:
+        with self._lock:
+            return self._refused
+
+    def _roll(self, key: str, counter: list, index: int):
+        if counter[0] != index:
+            counter[2] = counter[1] if counter[0] == index - 1 else 0
+            counter[1] = 0
+            counter[0] = index
+        self._counters.move_to_end(key)
+
+    def _drop_stale(self, index: int):
+        #keys last touched before the previous window no longer count
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            if counter[0] >= index - 1:
+                return
+            del self._counters[key]
+
+    def _evict(self, index: int, weight: float) -> bool:
+        for _ in range(min(self.EVICTION_CANDIDATES, len(self._counters))):
+            key, counter = next(iter(self._counters.items()))
+            if counter[0] == index:
+                attempts = counter[2] * weight + counter[1]
+            else:
+                attempts = counter[1] * weight if counter[0] == index - 1 else 0
+            if attempts < counter[3]:
+                del self._counters[key]
+                return True
+            #at its limit, checked again after the other keys
+            self._counters.move_to_end(key)
+        return False
+
+class RedisRateLimitBackend:
+    """
+    The same sliding window counters stored in Redis, shared by every
+    worker and instance. Needs the `redis` package.
+    """
+
+    #network calls, kept off the event loop by the limiter
+    blocking = True
+
+    #DECR that never takes a counter below zero, e.g. after it expired
+    UNDO_SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if current > 0 then
+        return redis.call('DECR', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, url: str, prefix: str = "login_rate_limit"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("LOGIN_RATE_LIMIT_BACKEND=redis requires the redis package")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.1)
+        self._undo = self._client.register_script(self.UNDO_SCRIPT)
+
+    def _key(self, key: str, index: int) -> str:
+        return f"{self.prefix}:{key}:{index}"
+
+    def hit(self, key: str, window: int, limit: float = math.inf) -> float:
+        now = time.time()
+        index = int(now // window)
+        pipe = self._client.pipeline()
+        pipe.incr(self._key(key, index))
+        pipe.expire(self._key(key, index), window * 2)
+        pipe.get(self._key(key, index - 1))
+        current, _, previous = pipe.execute()
+        weight = 1 - (now % window) / window
+        return int(previous or 0) * weight + current
+
+    def undo(self, key: str, window: int):
+        self._undo(keys=[self._key(key, int(time.time() // window))])
+
+    def reset(self, key: str, window: int):
+        index = int(time.time() // window)
+        self._client.delete(self._key(key, index), self._key(key, index - 1))
+
+    def size(self) -> int:
+        return 0
+
+    def refused(self) -> int:
+        return 0
+
+class LoginRateLimiter:
+    """
+    Limits the login attempts per username and per client IP.
+
+    Every attempt is counted before the password is checked and attempts
+    over the limit are answered with a 429 without touching the database
+    or the password pool. A successful login clears the username counter
+    and takes its attempt back from the IP counter, so only failures
+    accumulate. If the backend fails the attempts are let through.
+
+    When called from a service running on an AsyncSession (inside the
+    SQLAlchemy greenlet on the event loop) the calls to a blocking backend
+    run in a thread and are awaited instead of blocking the loop.
+    """
+
+    def __init__(self, backend, window: int, username_limit: int, ip_limit: int):
+        self.backend = backend
+        self.window = window
+        self.username_limit = username_limit
+        self.ip_limit = ip_limit
+        self._lock = threading.Lock()
+        self._attempts = 0
+        self._shed_username = 0
+        self._shed_ip = 0
+        self._backend_errors = 0
+
+    def _keys(self, username: str, client_ip: Optional[str]) -> list[tuple[str, str, int]]:
+        keys = []
+        if self.username_limit > 0:
+            keys.append(("username", f"user:{username.lower()}", self.username_limit))
+        if self.ip_limit > 0 and client_ip:
+            keys.append(("ip", f"ip:{client_ip}", self.ip_limit))
+        return keys
+
+    def attempt(self, username: str, client_ip: Optional[str]):
+        """Count a login attempt or raise 429 when a limit is exceeded"""
+        with self._lock:
+            self._attempts += 1
+
+        for kind, key, limit in self._keys(username, client_ip):
+            try:
+                attempts = self._call(self.backend.hit, key, self.window, limit)
+            except Exception:
+                self._backend_error()
+                return
+            if attempts > limit:
+                with self._lock:
+                    if kind == "username":
+                        self._shed_username += 1
+                    else:
+                        self._shed_ip += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos de inicio de sesión, intente más tarde",
+                    headers={"Retry-After": str(math.ceil(self.window - time.time() % self.window))},
+                )
+
+    def succeeded(self, username: str, client_ip: Optional[str]):
+        for kind, key, _ in self._keys(username, client_ip):
+            try:
+                if kind == "username":
+                    self._call(self.backend.reset, key, self.window)
+                else:
+                    self._call(self.backend.undo, key, self.window)
+            except Exception:
+                self._backend_error()
+
+    def _call(self, func, *args):
+        if self.backend.blocking and in_greenlet():
+            return await_only(asyncio.to_thread(func, *args))
+        return func(*args)
+
+    def _backend_error(self):
+        with self._lock:
+            self._backend_errors += 1
+        logger.warning("Login rate limit backend unavailable, letting the attempt through", exc_info=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "attempts": self._attempts,
+                "shed": self._shed_username + self._shed_ip,
+                "shed_username": self._shed_username,
+                "shed_ip": self._shed_ip,
+                "backend_errors": self._backend_errors,
+                "tracked_keys": self.backend.size(),
+                "refused_keys": self.backend.refused(),
+            }
+
+def build_backend():
+    if settings.LOGIN_RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend(settings.LOGIN_RATE_LIMIT_REDIS_URL)
+    return MemoryRateLimitBackend(max_keys=settings.LOGIN_RATE_LIMIT_MAX_KEYS)
+
+#global limiter used by the login services
+login_rate_limiter = LoginRateLimiter(
+    backend=build_backend(),
+    window=settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+    username_limit=settings.LOGIN_RATE_LIMIT_PER_USERNAME,
+    ip_limit=settings.LOGIN_RATE_LIMIT_PER_IP,
+)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+class TokenRevocations:
+    """
+    In-memory set of users whose access tokens must no longer validate.
+
+    Each entry stores the user's current `token_version` and whether the
+    user is active; a token is revoked when its `ver` claim is older or the
+    user was deactivated. Entries only need to live as long as an access
+    token can, so they are pruned after ACCESS_TOKEN_EXPIRE_MINUTES.
+    Changes made by this process are applied right away with `mark`, and
+    changes made by other workers are picked up by `sync`, which reads the
+    users updated since the previous run.
+
+    The sync watermark is taken from the database clock, the one that sets
+    `updated_at`. That value is the start of the writing transaction, so a
+    long transaction can commit a row older than the watermark; every
+    sync reads `overlap` further back to pick those up.
+    """
+
+    def __init__(self, retention: timedelta, interval: int, overlap: timedelta):
+        self.retention = retention
+        self.interval = interval
+        self.overlap = overlap
+        self._entries: dict[int, tuple[int, bool, float]] = {}
+        self._lock = threading.Lock()
+        self._last_sync = None
+        self._syncs = 0
+        self._revoked_checks = 0
+
+    def mark(self, user_id: int, token_version: int, is_active: bool):
+        """Record the current version and status of a user"""
+        with self._lock:
+            self._entries[user_id] = (token_version, is_active, time.monotonic())
+
+    def is_revoked(self, claims: dict) -> bool:
+        if not claims.get("act", False):
+            return True
+        with self._lock:
+            entry = self._entries.get(claims.get("uid"))
+        if entry is None:
+            return False
+        token_version, is_active, _ = entry
+        revoked = not is_active or claims.get("ver", 0) < token_version
+        if revoked:
+            with self._lock:
+                self._revoked_checks += 1
+        return revoked
+
+    def sync(self, db: Session):
+        """Load the users changed since the last sync and drop stale entries"""
+        now = db.execute(select(func.now())).scalar()
+        since = self._last_sync - self.overlap if self._last_sync else now - self.retention
+        rows = db.execute(
+            select(User.id, User.token_version, User.is_active).where(User.updated_at >= since)
+        ).all()
+
+        for user_id, token_version, is_active in rows:
+            self.mark(user_id, token_version or 0, bool(is_active))
+
+        expired = time.monotonic() - self.retention.total_seconds()
+        with self._lock:
+            for user_id in [key for key, entry in self._entries.items() if entry[2] < expired]:
+                del self._entries[user_id]
+            self._last_sync = now
+            self._syncs += 1
+
+    def run_sync(self):
+        db = SessionLocal()
+        try:
+            self.sync(db)
+        finally:
+            db.close()
+
+    async def run_forever(self):
+        """Background loop started with the application"""
+        while True:
+            try:
+                await run_db(self.run_sync)
+            except Exception:
+                logger.exception("Token revocation sync failed")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "syncs": self._syncs,
+                "revoked_checks": self._revoked_checks,
+            }
+
+#global revocation set used by the stateless validation
+token_revocations = TokenRevocations(
+    retention=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+    overlap=timedelta(seconds=settings.TOKEN_REVOCATION_SYNC_OVERLAP_SECONDS),
+)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, delete, func, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal, run_db
+from app.models.refresh_token import RefreshToken
+
+logger = logging.getLogger(__name__)
+
+class RefreshTokenReaper:
+    """
+    Deletes expired and revoked refresh tokens in small batches.
+
+    Each batch selects at most `batch_size` ids (skipping rows locked by
+    another worker) and deletes them in its own transaction, so no run
+    holds long locks on `refresh_tokens`.
+    """
+
+    def __init__(self, batch_size: int, max_batches: int, interval: int, revoked_retention: timedelta):
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        self.interval = interval
+        self.revoked_retention = revoked_retention
+        self._lock = threading.Lock()
+        self._stats = {
+            "runs": 0,
+            "rows_removed_total": 0,
+            "last_run_rows_removed": 0,
+            "last_run_seconds": 0.0,
+            "last_run_at": None,
+            "table_rows": None,
+            "table_bytes": None,
+        }
+
+    def purge(self, db: Session) -> int:
+        """Delete purgeable tokens batch by batch, returns the number of rows removed"""
+        now = datetime.now(timezone.utc)
+        purgeable = or_(
+            RefreshToken.expires_at < now,
+            and_(
+                RefreshToken.is_active == False,
+                func.coalesce(RefreshToken.revoked_at, RefreshToken.created_at) < now - self.revoked_retention,
+            ),
+        )
+
+        removed = 0
+        for _ in range(self.max_batches):
+            ids = db.execute(
+                select(RefreshToken.id)
+                .where(purgeable)
+                .order_by(RefreshToken.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not ids:
+                break
+
+            db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+            db.commit()
+            removed += len(ids)
+
+            if len(ids) < self.batch_size:
+                break
+        return removed
+
+    def table_size(self, db: Session) -> dict:
+        """Estimated rows and bytes of the refresh_tokens table"""
+        if db.get_bind().dialect.name == "postgresql":
+            row = db.execute(text(
+                "SELECT reltuples::bigint, pg_total_relation_size(oid) "
+                "FROM pg_class WHERE relname = 'refresh_tokens'"
+            )).first()
+            if row:
+                return {"table_rows": row[0], "table_bytes": row[1]}
+        return {"table_rows": db.query(func.count(RefreshToken.id)).scalar(), "table_bytes": None}
+
+    def run_once(self) -> int:
+        """Run one cleanup with its own session and record the metrics"""
+        start = time.perf_counter()
+        db = SessionLocal()
+        try:
+            removed = self.purge(db)
+            size = self.table_size(db)
+            db.commit()
+        finally:
+            db.close()
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["rows_removed_total"] += removed
+            self._stats["last_run_rows_removed"] = removed
+            self._stats["last_run_seconds"] = elapsed
+            self._stats["last_run_at"] = datetime.now(timezone.utc).isoformat()
+            self._stats.update(size)
+
+        logger.info("Refresh token cleanup removed %s rows in %.2fs", removed, elapsed)
+        return removed
+
+    async def run_forever(self):
+        """Background loop started with the application"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_db(self.run_once)
+            except Exception:
+                logger.exception("Refresh token cleanup failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+#global reaper scheduled on startup
+refresh_token_reaper = RefreshTokenReaper(
+    batch_size=settings.REFRESH_TOKEN_CLEANUP_BATCH_SIZE,
+    max_batches=settings.REFRESH_TOKEN_CLEANUP_MAX_BATCHES,
+    interval=settings.REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS,
+    revoked_retention=timedelta(hours=settings.REVOKED_REFRESH_TOKEN_RETENTION_HOURS),
+)
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+from jose import JWTError, jwt
+from jose.backends.base import Key
+
+from app.config import settings
+from app.services.keys import KeyMaterial, KeyStore, key_store
+
+class TokenVerifier:
+    """
+    Verifies JWTs with the cached public key.
+
+    Tokens whose signature was already checked are kept in a bounded LRU
+    until they expire, so repeated requests with the same bearer token
+    skip the signature verification.
+    """
+
+    def __init__(self, store: KeyStore, algorithms: list[str], cache_size: int):
+        self.key_store = store
+        self.algorithms = algorithms
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._key_version = 0
+        self._lock = threading.Lock()
+        self._verifications = 0
+        self._cache_hits = 0
+        self._failures = 0
+        self._verify_seconds = 0.0
+
+    def verify(self, token: str, use_cache: bool = True) -> dict:
+        """Return the claims of a valid token or raise JWTError"""
+        material = self.key_store.material
+        now = time.time()
+
+        with self._lock:
+            if material.version != self._key_version:
+                #keys were rotated, cached results are no longer trustworthy
+                self._cache.clear()
+                self._key_version = material.version
+
+            if use_cache:
+                cached = self._cache.get(token)
+                if cached is not None:
+                    claims, expires_at = cached
+                    if expires_at > now:
+                        self._cache.move_to_end(token)
+                        self._cache_hits += 1
+                        return dict(claims)
+                    del self._cache[token]
+
+        start = time.perf_counter()
+        try:
+            key, algorithms = self._select_key(material, token)
+            claims = jwt.decode(token, key, algorithms=algorithms)
+        except JWTError:
+            with self._lock:
+                self._failures += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._verifications += 1
+                self._verify_seconds += elapsed
+
+        expires_at = claims.get("exp")
+        if use_cache and self.cache_size > 0 and isinstance(expires_at, (int, float)):
+            with self._lock:
+                self._cache[token] = (dict(claims), float(expires_at))
+                self._cache.move_to_end(token)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return claims
+
+    def _select_key(self, material: KeyMaterial, token: str) -> tuple[Key, list[str]]:
+        """
+        Public key named by the token `kid` and the algorithm it was published
+        with; tokens without a `kid` predate it and use the current key
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return material.verifying_key, self.algorithms
+        key = material.verifying_keys.get(kid)
+        if key is None:
+            raise JWTError("Unknown key id")
+        return key, [material.algorithms[kid]]
+
+    def clear(self):
+        """Drop every cached verification"""
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> dict:
+        """Counters and throughput of the signature verifications"""
+        with self._lock:
+            verifications = self._verifications
+            verify_seconds = self._verify_seconds
+            requests = verifications + self._cache_hits
+            return {
+                "verifications": verifications,
+                "cache_hits": self._cache_hits,
+                "failures": self._failures,
+                "cache_entries": len(self._cache),
+                "cache_size": self.cache_size,
+                "cache_hit_ratio": self._cache_hits / requests if requests else 0.0,
+                "avg_verify_ms": verify_seconds * 1000 / verifications if verifications else 0.0,
+                "verifications_per_second": verifications / verify_seconds if verify_seconds else 0.0,
+            }
+
+#global verifier used by the auth dependencies
+token_verifier = TokenVerifier(
+    store=key_store,
+    algorithms=[settings.ALGORITHM],
+    cache_size=settings.TOKEN_VERIFIER_CACHE_SIZE,
+)
@@ -1,11 +1,22 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import update
+from sqlalchemy import update, select, func, text, tuple_, or_
 from fastapi import HTTPException, status
-from typing import Optional
+from typing import Iterator, Optional
+from datetime import datetime
+import base64
+import binascii
+import csv
+import io
+import json
+
+from app.config import settings
+from app.database import SessionLocal, insert_do_nothing
 
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, PasswordChange, UserSelfUpdate
 from app.services.auth import get_password_hash, verify_password
+from app.services.user_cache import user_cache
+from app.services.revocation import token_revocations
 
 def get_user_by_email(db:Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
@@ -14,35 +25,42 @@ def get_user_by_username(db:Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 def create_user(db: Session, user: UserCreate) -> User:
-    """Create a new user"""
-    #Check if the email is already registered
-    db_user = get_user_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El coreo electrónico ya esta registrado"
-        )
-
-    #Check if the username is already registered
-    db_user = get_user_by_username(db, username=user.username)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El nombre de usario ya esta registrado"
-        )
-
-    #Create the user object with the hashed password
+    """
+    Create a new user with a single INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    The unique indexes on email and username reject duplicates; only when the
+    insert is skipped a second query finds out which field conflicted.
+    """
+    #Hash first, in the password pool, so the insert is the only round-trip
     hashed_password = get_password_hash(user.password)
-    db_user = User(
+
+    statement = insert_do_nothing(db, User).values(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password,
         full_name=user.full_name
-    )
+    ).returning(User)
+    db_user = db.scalars(statement).first()
+
+    if db_user is None:
+        conflicts = db.execute(
+            select(User.email).where(or_(User.email == user.email, User.username == user.username))
+        ).all()
+        db.rollback()
+
+        #Check if the email is already registered
+        if any(conflict.email == user.email for conflict in conflicts):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El coreo electrónico ya esta registrado"
+            )
+
+        #Otherwise the username is already registered
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El nombre de usario ya esta registrado"
+        )
 
-    db.add(db_user)
     db.commit()
-    db.refresh(db_user)
 
     return db_user
 
@@ -62,6 +80,7 @@ def user_profile_update(user_update: UserSelfUpdate, current_user: User, db: Ses
     update_values = update(User).where(User.id == current_user.id).values(full_name = user_update.full_name, email = user_update.email)
     db.execute(update_values)
     db.commit()
+    user_cache.invalidate(current_user.id)
     db.refresh(current_user)
 
     return current_user
@@ -101,20 +120,25 @@ def user_id_update(user_id: int, db: Session, user_update: UserUpdate, current_u
             detail="nombre de usuario ya en uso"
         )
 
+    if user.username != user_update.username or user.is_admin != user_update.is_admin:
+        #the sub or adm claim of the issued tokens is no longer valid
+        user.token_version = (user.token_version or 0) + 1
     user.username = user_update.username
     user.email = user_update.email
     user.full_name = user_update.full_name
     user.is_admin = user_update.is_admin
     db.commit()
+    user_cache.invalidate(user.id)
+    token_revocations.mark(user.id, user.token_version, user.is_active)
     db.refresh(user)
 
     return user
 
 def get_user_profile(user: User, db:Session):
 
-    user_info = db.query(User).filter(User.id == user.id).first()
+    user_info = user_cache.get_by_id(db, user.id) or db.get(User, user.id)
 
-    if not user:
+    if not user_info:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="id de usuario inválido")
@@ -148,8 +172,11 @@ def user_change_password(passwords: PasswordChange, current_user: User, db:Sessi
         )
     
     current_user.hashed_password = get_password_hash(passwords.new_password)
+    current_user.token_version = (current_user.token_version or 0) + 1
     db.add(current_user)
     db.commit()
+    user_cache.invalidate(current_user.id)
+    token_revocations.mark(current_user.id, current_user.token_version, current_user.is_active)
 
     return
 
@@ -160,4 +187,128 @@ def get_user_list(page: int, limit: int, current_user:User, db:Session):
     users = db.query(User).offset(skip_page).limit(limit).all()
 
     return users, total
-    
\ No newline at end of file
+
+def encode_cursor(direction: str, user: User) -> str:
+    """Opaque cursor pointing before ("p") or after ("n") a user in (created_at, id) order"""
+    payload = json.dumps([direction, user.created_at.isoformat(), user.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple[str, datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        direction, created_at, user_id = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ("n", "p"):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(created_at), int(user_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor inválido"
+        )
+
+def count_users(db: Session, mode: str) -> Optional[int]:
+    """Total of users: "exact" counts, "estimate" reads the planner statistics, "none" skips it"""
+    if mode == "none":
+        return None
+
+    if mode == "estimate" and db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'users'")).scalar()
+        #reltuples is -1 until the table has been analyzed
+        if estimate is not None and estimate >= 0:
+            return estimate
+
+    return db.query(func.count(User.id)).scalar()
+
+def get_user_list_keyset(cursor: Optional[str], limit: int, count: str, db: Session):
+    """
+    Page of users ordered by (created_at, id) starting at `cursor`.
+    Returns the users, the next and previous cursors and the total.
+    """
+    #SQLite compares datetimes as text and CURRENT_TIMESTAMP values have no
+    #microseconds while bound datetimes do, julianday compares both as numbers
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    created_at_key = func.julianday(User.created_at) if sqlite else User.created_at
+
+    order_key = tuple_(created_at_key, User.id)
+    query = select(User)
+    direction = "n"
+
+    if cursor:
+        direction, created_at, user_id = decode_cursor(cursor)
+        if sqlite:
+            created_at = func.julianday(created_at)
+        if direction == "n":
+            query = query.where(order_key > tuple_(created_at, user_id))
+        else:
+            query = query.where(order_key < tuple_(created_at, user_id))
+
+    if direction == "n":
+        query = query.order_by(created_at_key, User.id)
+    else:
+        query = query.order_by(created_at_key.desc(), User.id.desc())
+
+    #one extra row tells whether there is another page in that direction
+    users = db.execute(query.limit(limit + 1)).scalars().all()
+    has_more = len(users) > limit
+    users = users[:limit]
+
+    if direction == "p":
+        users.reverse()
+        next_cursor = encode_cursor("n", users[-1]) if users else None
+        prev_cursor = encode_cursor("p", users[0]) if users and has_more else None
+    else:
+        next_cursor = encode_cursor("n", users[-1]) if users and has_more else None
+        prev_cursor = encode_cursor("p", users[0]) if users and cursor else None
+
+    return users, next_cursor, prev_cursor, count_users(db, count)
+
+EXPORT_COLUMNS = (
+    User.id,
+    User.username,
+    User.email,
+    User.full_name,
+    User.is_active,
+    User.is_admin,
+    User.created_at,
+    User.updated_at,
+)
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def export_users(export_format: str) -> Iterator[str]:
+    """
+    Yield every user as NDJSON lines or CSV rows, one chunk per batch.
+
+    The rows are read through a server-side cursor with `yield_per`, so
+    memory stays constant regardless of the size of the table. The
+    generator opens its own session because it outlives the request
+    dependencies.
+    """
+    names = [column.key for column in EXPORT_COLUMNS]
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            select(*EXPORT_COLUMNS)
+            .order_by(User.id)
+            .execution_options(yield_per=settings.USER_EXPORT_BATCH_SIZE)
+        )
+
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for rows in result.partitions():
+                writer.writerows([_export_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(
+                    json.dumps({name: _export_value(value) for name, value in zip(names, row)}) + "\n"
+                    for row in rows
+                )
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.config import settings
+from app.models.user import User
+
+class UserCache:
+    """
+    Process-local TTL + LRU cache of user rows keyed by username and id.
+
+    Entries are plain column snapshots, never session-bound objects; a hit
+    is attached to the caller's session with `merge(load=False)`, which
+    doesn't emit any SQL.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[dict, float]] = OrderedDict()
+        self._ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get_by_username(self, db: Session, username: str) -> Optional[User]:
+        with self._lock:
+            user_id = self._ids.get(username)
+        if user_id is None:
+            self._count_miss()
+            return None
+        return self.get_by_id(db, user_id)
+
+    def get_by_id(self, db: Session, user_id: int) -> Optional[User]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    self._remove(user_id)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            values = entry[0]
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def put(self, user: User):
+        if self.max_size <= 0:
+            return
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        with self._lock:
+            self._remove(user.id)
+            self._entries[user.id] = (values, time.monotonic() + self.ttl)
+            self._ids[user.username] = user.id
+            while len(self._entries) > self.max_size:
+                oldest_id, _ = next(iter(self._entries.items()))
+                self._remove(oldest_id)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._ids.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _count_miss(self):
+        with self._lock:
+            self._misses += 1
+
+    def _remove(self, user_id: int):
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._ids.pop(entry[0]["username"], None)
+
+#global cache used by the auth dependencies and user services
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+from typing import Iterator, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import insert_do_nothing
+from app.models.user import User
+from app.schemas.user import UserCreate
+from app.services.password_hasher import password_hasher
+
+def parse_rows(content: str, import_format: str) -> Iterator[tuple[int, dict]]:
+    """Yield (row number, raw fields) from a CSV with a header or from NDJSON"""
+    if import_format == "csv":
+        #row 1 is the header
+        for number, row in enumerate(csv.DictReader(io.StringIO(content)), start=2):
+            yield number, row
+        return
+
+    for number, line in enumerate(content.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield number, row if isinstance(row, dict) else {"_invalid": line}
+
+def import_users(
+    db: Session,
+    content: str,
+    import_format: str,
+    batch_size: int = settings.USER_IMPORT_BATCH_SIZE,
+    max_rows: Optional[int] = None
+) -> dict:
+    """
+    Create users in bulk.
+
+    Rows are validated with `UserCreate`, their passwords hashed in
+    parallel in the password pool and inserted with multi-row
+    INSERT ... ON CONFLICT DO NOTHING statements of `batch_size` rows,
+    one commit per batch. Invalid rows and duplicates (inside the file or
+    against existing users) are reported per row instead of failing the
+    whole import. Files with more than `max_rows` rows are rejected with
+    a 413 before anything is hashed.
+    """
+    errors = []
+    duplicates = []
+    valid: list[tuple[int, UserCreate]] = []
+    seen_emails: set[str] = set()
+    seen_usernames: set[str] = set()
+
+    for rows, (number, row) in enumerate(parse_rows(content, import_format), start=1):
+        if max_rows is not None and rows > max_rows:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"El archivo tiene más de {max_rows} filas, use scripts/import_users.py"
+            )
+        if "_invalid" in row:
+            errors.append({"row": number, "field": None, "detail": "JSON inválido"})
+            continue
+        if None in row:
+            #csv.DictReader puts the fields past the header under the None key
+            errors.append({"row": number, "field": None, "detail": "La fila tiene más columnas que el encabezado"})
+            continue
+        try:
+            user = UserCreate(**{key: value for key, value in row.items() if value not in ("", None)})
+        except ValidationError as e:
+            error = e.errors()[0]
+            errors.append({
+                "row": number,
+                "field": ".".join(str(part) for part in error["loc"]) or None,
+                "detail": error["msg"],
+            })
+            continue
+
+        if user.email in seen_emails:
+            duplicates.append({"row": number, "field": "email", "detail": "correo repetido en el archivo"})
+            continue
+        if user.username in seen_usernames:
+            duplicates.append({"row": number, "field": "username", "detail": "nombre de usuario repetido en el archivo"})
+            continue
+        seen_emails.add(user.email)
+        seen_usernames.add(user.username)
+        valid.append((number, user))
+
+    created = 0
+    for index in range(0, len(valid), batch_size):
+        batch = valid[index:index + batch_size]
+        hashes = password_hasher.hash_many([user.password for _, user in batch])
+
+        inserted = db.execute(
+            insert_do_nothing(db, User)
+            .values([
+                {
+                    "email": user.email,
+                    "username": user.username,
+                    "hashed_password": hashed_password,
+                    "full_name": user.full_name,
+                    "is_active": True,
+                    "is_admin": False,
+                }
+                for (_, user), hashed_password in zip(batch, hashes)
+            ])
+            .returning(User.username)
+        ).scalars().all()
+        created += len(inserted)
+
+        inserted_usernames = set(inserted)
+        skipped = [(number, user) for number, user in batch if user.username not in inserted_usernames]
+        if skipped:
+            taken_emails = set(db.execute(
+                select(User.email).where(or_(
+                    User.email.in_([user.email for _, user in skipped]),
+                    User.username.in_([user.username for _, user in skipped]),
+                ))
+            ).scalars())
+            for number, user in skipped:
+                if user.email in taken_emails:
+                    duplicates.append({"row": number, "field": "email", "detail": "El coreo electrónico ya esta registrado"})
+                else:
+                    duplicates.append({"row": number, "field": "username", "detail": "El nombre de usario ya esta registrado"})
+
+        db.commit()
+
+    return {
+        "created": created,
+        "duplicates": sorted(duplicates, key=lambda item: item["row"]),
+        "errors": errors,
+    }
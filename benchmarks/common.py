@@ -0,0 +1,85 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def configure_environment():
+    """
+    Point the application at a throwaway SQLite database and the repo keys
+    unless the caller already configured them. Must run before importing `app`.
+    """
+    os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="bench-"), "bench.db"))
+    os.environ.setdefault("RSA_PRIVATE_KEY_PATH", os.path.join(BASE_DIR, "keys", "private.pem"))
+    os.environ.setdefault("RSA_PUBLIC_KEY_PATH", os.path.join(BASE_DIR, "keys", "public.pem"))
+    os.environ.setdefault("REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS", "0")
+    os.environ.setdefault("DEBUG", "False")
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def measure(name: str, func: Callable[[], object], iterations: int, warmup: int = 3) -> dict:
+    """Run `func` `iterations` times and return throughput and latency percentiles"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_second": iterations / elapsed,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+    }
+
+def print_report(results: list[dict]):
+    header = f"{'benchmark':<32}{'iters':>7}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['name']:<32}{result['iterations']:>7}{result['ops_per_second']:>12.1f}"
+            f"{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['p99_ms']:>10.3f}"
+        )
+
+def save_baseline(path: str, results: list[dict]):
+    with open(path, "w") as f:
+        json.dump({result["name"]: result for result in results}, f, indent=2)
+    print(f"Baseline saved to: {path}")
+
+def compare_baseline(path: str, results: list[dict], tolerance: float) -> list[str]:
+    """
+    Return a message per benchmark whose p95 latency grew, or whose
+    throughput dropped, by more than `tolerance` against the baseline
+    """
+    with open(path) as f:
+        baseline = json.load(f)
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result["name"])
+        if previous is None:
+            continue
+        if result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{result['name']}: p95 {previous['p95_ms']:.3f} ms -> {result['p95_ms']:.3f} ms"
+            )
+        if result["ops_per_second"] < previous["ops_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{result['name']}: {previous['ops_per_second']:.1f} ops/s -> {result['ops_per_second']:.1f} ops/s"
+            )
+    return regressions
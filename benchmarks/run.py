@@ -0,0 +1,152 @@
+"""
+Benchmarks for the auth and user endpoints and their hot functions.
+
+Runs the real `app.main:app` in-process against SQLite (or the database in
+DATABASE_URL) and reports throughput and p50/p95/p99 latency.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --tolerance 0.2
+"""
+import argparse
+import sys
+
+from benchmarks.common import configure_environment, measure, print_report, save_baseline, compare_baseline
+
+configure_environment()
+
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.config import settings
+from app.database import Base, SessionLocal, engine
+from app.main import app
+# every model is imported so create_all builds all the tables
+from app.models.refresh_token import RefreshToken
+from app.models.roles import Role
+from app.models.user import User
+from app.services.auth import create_access_token, get_password_hash, verify_password
+from app.services.keys import key_store
+from app.services.user import get_user_list
+
+USERNAME = "benchuser"
+PASSWORD = "benchpassword"
+
+def seed_users(count: int):
+    """Insert `count` extra users sharing one precomputed hash"""
+    hashed_password = get_password_hash(PASSWORD)
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(User, [
+            {
+                "email": f"seed{i}@example.com",
+                "username": f"seed{i}",
+                "hashed_password": hashed_password,
+                "is_active": True,
+                "is_admin": False,
+            }
+            for i in range(count)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def endpoint_benchmarks(client: TestClient, iterations: int, login_iterations: int) -> list[dict]:
+    credentials = {"username": USERNAME, "password": PASSWORD}
+
+    def login():
+        response = client.post("/api/auth/login", data=credentials)
+        assert response.status_code == 200, response.text
+
+    def token():
+        response = client.post("/api/auth/token", data=credentials)
+        assert response.status_code == 200, response.text
+
+    tokens = client.post("/api/auth/token", data=credentials).json()
+    access_token = tokens["access_token"]
+    state = {"refresh_token": tokens["refresh_token"]}
+    headers = {"Authorization": f"Bearer {access_token}"}
+
+    def refresh():
+        response = client.post("/api/auth/refresh", json={"refresh_token": state["refresh_token"]})
+        assert response.status_code == 200, response.text
+        state["refresh_token"] = response.json()["refresh_token"]
+
+    def validate():
+        response = client.post("/api/auth/validate", json={"access_token": access_token})
+        assert response.status_code == 200, response.text
+
+    def me():
+        response = client.get("/api/user/me", headers=headers)
+        assert response.status_code == 200, response.text
+
+    return [
+        measure("POST /api/auth/login", login, login_iterations),
+        measure("POST /api/auth/token", token, login_iterations),
+        measure("POST /api/auth/refresh", refresh, iterations),
+        measure("POST /api/auth/validate", validate, iterations),
+        measure("GET /api/user/me", me, iterations),
+    ]
+
+def micro_benchmarks(iterations: int, login_iterations: int, seeded_users: int) -> list[dict]:
+    token = create_access_token(data={"sub": USERNAME})
+    verifying_key = key_store.material.verifying_key
+    hashed_password = get_password_hash(PASSWORD)
+    last_page = max(1, seeded_users // 50)
+
+    def list_users():
+        db = SessionLocal()
+        try:
+            get_user_list(last_page, 50, None, db)
+        finally:
+            db.close()
+
+    return [
+        measure("create_access_token", lambda: create_access_token(data={"sub": USERNAME}), iterations),
+        measure("jwt.decode", lambda: jwt.decode(token, verifying_key, algorithms=[settings.ALGORITHM]), iterations),
+        measure("verify_password", lambda: verify_password(PASSWORD, hashed_password), login_iterations),
+        measure(f"get_user_list (page {last_page})", list_users, iterations),
+    ]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500, help="iterations of the fast benchmarks")
+    parser.add_argument("--login-iterations", type=int, default=20, help="iterations of the bcrypt bound benchmarks")
+    parser.add_argument("--users", type=int, default=5000, help="extra users seeded for the list benchmark")
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as the new baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare the results against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression ratio (default 0.2)")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+
+    with TestClient(app) as client:
+        response = client.post("/api/auth/register", json={
+            "email": "bench@example.com",
+            "username": USERNAME,
+            "password": PASSWORD,
+        })
+        assert response.status_code in (201, 400), response.text
+        seed_users(args.users)
+
+        results = endpoint_benchmarks(client, args.iterations, args.login_iterations)
+        results += micro_benchmarks(args.iterations, args.login_iterations, args.users)
+
+    print_report(results)
+
+    if args.save_baseline:
+        save_baseline(args.save_baseline, results)
+
+    if args.compare:
+        regressions = compare_baseline(args.compare, results, args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against the baseline")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Sign and verify throughput of the JWT algorithms the key store supports,
+with the access token claims the auth service issues.
+
+    python -m benchmarks.signing_algorithms
+    python -m benchmarks.signing_algorithms --algorithms RS256 EdDSA --iterations 5000
+"""
+import argparse
+import sys
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from jose import jwk, jwt
+
+# registers the EdDSA key class with python-jose
+from app.services.eddsa import EDDSA
+from benchmarks.common import measure, print_report
+
+ALGORITHMS = ("RS256", "ES256", EDDSA)
+
+def generate_key_pair(algorithm: str) -> tuple[str, str]:
+    """Private and public PEM of a throwaway key like the key script creates"""
+    if algorithm == "ES256":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == EDDSA:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    public_pem = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo,
+    ).decode()
+    return private_pem, public_pem
+
+def algorithm_benchmarks(algorithm: str, iterations: int) -> list[dict]:
+    private_pem, public_pem = generate_key_pair(algorithm)
+    signing_key = jwk.construct(private_pem, algorithm)
+    verifying_key = jwk.construct(public_pem, algorithm)
+    claims = {
+        "sub": "benchuser",
+        "uid": 1,
+        "adm": False,
+        "act": True,
+        "ver": 0,
+        "exp": int(time.time()) + 3600,
+    }
+    token = jwt.encode(claims, signing_key, algorithm=algorithm, headers={"kid": "bench"})
+
+    return [
+        measure(f"{algorithm} sign", lambda: jwt.encode(claims, signing_key, algorithm=algorithm, headers={"kid": "bench"}), iterations),
+        measure(f"{algorithm} verify", lambda: jwt.decode(token, verifying_key, algorithms=[algorithm]), iterations),
+    ]
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", choices=ALGORITHMS, default=list(ALGORITHMS))
+    parser.add_argument("--iterations", type=int, default=2000, help="sign and verify operations per algorithm")
+    args = parser.parse_args()
+
+    results = []
+    for algorithm in args.algorithms:
+        results += algorithm_benchmarks(algorithm, args.iterations)
+
+    print_report(results)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,90 @@
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from cryptography.hazmat.backends import default_backend
+import argparse
 import os
+import shutil
+import time
 
-def generate_rsa_keys():
-    # Create keys directory if it doesn't exist
-    os.makedirs('keys', exist_ok=True)
-    
-    # Generate private key
-    private_key = rsa.generate_private_key(
+PUBLIC_KEYS_DIR = 'keys/public_keys'
+
+ALGORITHMS = ("RS256", "ES256", "EdDSA")
+
+def generate_private_key(algorithm):
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1(), backend=default_backend())
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    return rsa.generate_private_key(
         public_exponent=65537,
         key_size=2048,
         backend=default_backend()
     )
+
+def write_atomic(path, data):
+    # Readers see the old or the new file, never a partial one
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+def generate_rsa_keys(algorithm="RS256"):
+    # Create keys directory if it doesn't exist
+    os.makedirs('keys', exist_ok=True)
+    
+    # Generate private key, set ALGORITHM to the same value in the settings
+    private_key = generate_private_key(algorithm)
     
     # Generate public key
     public_key = private_key.public_key()
     
-    # Save private key
-    with open('keys/private.pem', 'wb') as f:
-        f.write(private_key.private_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PrivateFormat.PKCS8,
-            encryption_algorithm=serialization.NoEncryption()
-        ))
+    # Save private key, a reload before the public key is replaced sees a
+    # mismatched pair and keeps the previous keys
+    write_atomic('keys/private.pem', private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ))
     
     # Save public key
-    with open('keys/public.pem', 'wb') as f:
-        f.write(public_key.public_bytes(
-            encoding=serialization.Encoding.PEM,
-            format=serialization.PublicFormat.SubjectPublicKeyInfo
-        ))
+    write_atomic('keys/public.pem', public_key.public_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PublicFormat.SubjectPublicKeyInfo
+    ))
     
-    print("RSA keys generated successfully!")
+    print(f"{algorithm} keys generated successfully!")
     print("Private key saved to: keys/private.pem")
     print("Public key saved to: keys/public.pem")
 
+def rotate_rsa_keys(algorithm="RS256"):
+    # Keep publishing the current public key so the tokens it signed still verify
+    if os.path.exists('keys/public.pem'):
+        os.makedirs(PUBLIC_KEYS_DIR, exist_ok=True)
+        retired = os.path.join(PUBLIC_KEYS_DIR, f"{int(time.time())}.pem")
+        shutil.copyfile('keys/public.pem', retired + '.tmp')
+        os.replace(retired + '.tmp', retired)
+        print(f"Previous public key kept in: {retired}")
+
+    generate_rsa_keys(algorithm)
+
+def prune_public_keys():
+    # Run once the tokens signed with the retired keys have expired
+    if os.path.isdir(PUBLIC_KEYS_DIR):
+        for name in os.listdir(PUBLIC_KEYS_DIR):
+            if name.endswith('.pem'):
+                os.remove(os.path.join(PUBLIC_KEYS_DIR, name))
+                print(f"Removed retired public key: {name}")
+
 if __name__ == "__main__":
-    generate_rsa_keys()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate the keys used to sign the JWTs")
+    parser.add_argument("--algorithm", choices=ALGORITHMS, default="RS256", help="JWS algorithm of the new key pair")
+    parser.add_argument("--rotate", action="store_true", help="generate a new pair and keep the current public key published")
+    parser.add_argument("--prune", action="store_true", help="stop publishing the retired public keys")
+    args = parser.parse_args()
+
+    if args.prune:
+        prune_public_keys()
+    elif args.rotate:
+        rotate_rsa_keys(args.algorithm)
+    else:
+        generate_rsa_keys(args.algorithm)
@@ -0,0 +1,43 @@
+import argparse
+import json
+import os
+import sys
+
+# Add the base directory to the path to be able to import the application
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_DIR)
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.user import User
+from app.models.refresh_token import RefreshToken
+from app.services.password_hasher import password_hasher
+from app.services.user_import import import_users
+
+def main():
+    parser = argparse.ArgumentParser(description="Create users in bulk from a CSV or NDJSON file")
+    parser.add_argument("path", help="CSV file with a header row or NDJSON file")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=settings.USER_IMPORT_BATCH_SIZE, help="rows per INSERT and commit")
+    args = parser.parse_args()
+
+    import_format = args.format or ("csv" if args.path.lower().endswith(".csv") else "ndjson")
+    with open(args.path, encoding="utf-8-sig") as f:
+        content = f.read()
+
+    db = SessionLocal()
+    try:
+        result = import_users(db, content, import_format, batch_size=args.batch_size)
+    finally:
+        db.close()
+        password_hasher.shutdown()
+
+    for issue in result["duplicates"] + result["errors"]:
+        print(json.dumps(issue, ensure_ascii=False))
+
+    print(f"Users created: {result['created']}")
+    print(f"Duplicates: {len(result['duplicates'])}")
+    print(f"Errors: {len(result['errors'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""JWT key loading and reloading, see KeyStore"""
+import os
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from app.services.keys import KeyStore
+
+def write_pair(directory, name: str) -> tuple[bytes, bytes]:
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    (directory / f"{name}.private.pem").write_bytes(private_pem)
+    (directory / f"{name}.public.pem").write_bytes(public_pem)
+    return private_pem, public_pem
+
+@pytest.fixture
+def store(tmp_path):
+    private_pem, public_pem = write_pair(tmp_path, "old")
+    (tmp_path / "private.pem").write_bytes(private_pem)
+    (tmp_path / "public.pem").write_bytes(public_pem)
+    return KeyStore(str(tmp_path / "private.pem"), str(tmp_path / "public.pem"), "RS256", reload_interval=0)
+
+def test_mismatched_pair_is_rejected(store, tmp_path):
+    new_private_pem, _ = write_pair(tmp_path, "new")
+    (tmp_path / "private.pem").write_bytes(new_private_pem)
+
+    with pytest.raises(HTTPException):
+        store.reload()
+
+def test_reload_halfway_through_a_rotation_keeps_the_previous_keys(store, tmp_path):
+    previous = store.reload()
+    new_private_pem, new_public_pem = write_pair(tmp_path, "new")
+    (tmp_path / "private.pem").write_bytes(new_private_pem)
+    os.utime(tmp_path / "private.pem", (1, 1))
+
+    assert store._refresh() is previous
+
+    (tmp_path / "public.pem").write_bytes(new_public_pem)
+    rotated = store._refresh()
+    assert rotated.kid != previous.kid
+    assert rotated.private_pem == new_private_pem.decode()
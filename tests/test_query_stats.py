@@ -0,0 +1,12 @@
+"""Per request statement stats, see app/query_stats.py"""
+
+from app.query_stats import RequestQueryStats
+
+class Route:
+    path = "/api/user/{user_id}"
+
+def test_route_label_is_the_route_template():
+    assert RequestQueryStats({"path": "/api/user/7", "route": Route()}).route == "/api/user/{user_id}"
+
+def test_unmatched_paths_share_one_label():
+    assert RequestQueryStats({"path": "/random-404-url"}).route == "unmatched"
@@ -0,0 +1,67 @@
+"""Login rate limiting, see MemoryRateLimitBackend and LoginRateLimiter"""
+import math
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import rate_limit
+from app.services.rate_limit import LoginRateLimiter, MemoryRateLimitBackend
+
+WINDOW = 3600
+
+def test_least_recently_used_key_is_evicted():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    backend.hit("a", WINDOW, 5)
+    backend.hit("b", WINDOW, 5)
+    backend.hit("a", WINDOW, 5)
+
+    backend.hit("c", WINDOW, 5)
+
+    assert list(backend._counters) == ["a", "c"]
+
+def test_keys_at_their_limit_are_not_evicted():
+    backend = MemoryRateLimitBackend(max_keys=4)
+    for _ in range(3):
+        backend.hit("victim", WINDOW, 3)
+
+    for index in range(100):
+        backend.hit(f"other{index}", WINDOW, 3)
+
+    assert backend.size() == 4
+    assert backend.hit("victim", WINDOW, 3) > 3
+
+def test_new_key_is_refused_when_every_key_is_at_its_limit():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    for key in ("a", "b"):
+        backend.hit(key, WINDOW, 1)
+
+    assert backend.hit("c", WINDOW, 1) == math.inf
+    assert backend.refused() == 1
+    assert backend.size() == 2
+
+def test_stale_keys_are_dropped(monkeypatch):
+    backend = MemoryRateLimitBackend(max_keys=10)
+    now = 1_000_000 * WINDOW
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now)
+    for index in range(5):
+        backend.hit(f"old{index}", WINDOW, 5)
+
+    now += 2 * WINDOW
+    backend.hit("new", WINDOW, 5)
+
+    assert list(backend._counters) == ["new"]
+
+def test_distinct_usernames_do_not_reset_the_victim():
+    limiter = LoginRateLimiter(MemoryRateLimitBackend(max_keys=5), window=WINDOW, username_limit=3, ip_limit=0)
+    for _ in range(3):
+        limiter.attempt("victim", None)
+
+    for index in range(100):
+        try:
+            limiter.attempt(f"stuffed{index}", None)
+        except HTTPException:
+            pass
+
+    with pytest.raises(HTTPException) as error:
+        limiter.attempt("victim", None)
+    assert error.value.status_code == 429
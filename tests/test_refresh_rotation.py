@@ -0,0 +1,67 @@
+"""Refresh token rotation, see claim_refresh_token"""
+import pytest
+from fastapi import HTTPException
+
+from app.models.refresh_token import RefreshToken
+from app.schemas.auth import RefreshTokenRequest
+from app.services.auth import REFRESH_TOKEN_REUSE, renovate_access_token
+from tests.conftest import issue_refresh_token
+
+def reuse_count() -> float:
+    return REFRESH_TOKEN_REUSE._values.get((), 0.0)
+
+def test_rotation_deactivates_the_old_token(db, user):
+    refresh_token = issue_refresh_token(db, user)
+
+    _, new_refresh_token = renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+
+    tokens = {token.token_hash: token for token in db.query(RefreshToken).all()}
+    assert new_refresh_token != refresh_token
+    assert [token.is_active for token in tokens.values()].count(True) == 1
+
+def test_refresh_of_an_inactive_user_is_not_reuse(db, user):
+    refresh_token = issue_refresh_token(db, user)
+    user.is_active = False
+    db.commit()
+    reused = reuse_count()
+
+    with pytest.raises(HTTPException) as error:
+        renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+
+    assert error.value.status_code == 401
+    assert reuse_count() == reused
+    db.expire_all()
+    token = db.query(RefreshToken).one()
+    assert token.is_active is True
+    assert token.revoked_at is None
+
+def test_reused_token_revokes_the_family(db, user):
+    refresh_token = issue_refresh_token(db, user)
+    renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+    reused = reuse_count()
+
+    with pytest.raises(HTTPException):
+        renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+
+    assert reuse_count() == reused + 1
+    db.expire_all()
+    assert db.query(RefreshToken).filter(RefreshToken.is_active == True).count() == 0
+
+def test_rotation_rejects_a_stale_token_version(db, user):
+    refresh_token = issue_refresh_token(db, user)
+    user.token_version = (user.token_version or 0) + 1
+    db.commit()
+    reused = reuse_count()
+
+    with pytest.raises(HTTPException) as error:
+        renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+
+    assert error.value.status_code == 401
+    assert reuse_count() == reused
+
+def test_rotation_accepts_tokens_stored_without_a_version(db, user):
+    refresh_token = issue_refresh_token(db, user)
+    db.query(RefreshToken).update({RefreshToken.token_version: None})
+    db.commit()
+
+    renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
@@ -0,0 +1,63 @@
+"""Bulk session revocation, see revoke_sessions"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.refresh_token import RefreshToken
+from app.schemas.auth import RefreshTokenRequest, SessionRevokeRequest
+from app.services.auth import renovate_access_token, revoke_sessions
+from tests.conftest import create_user, issue_refresh_token
+
+def test_revoke_by_users_runs_until_no_token_is_left(db):
+    users = [create_user(db, f"user{index}") for index in range(3)]
+    other = create_user(db, "other")
+    for user in users:
+        for _ in range(3):
+            issue_refresh_token(db, user)
+    kept = issue_refresh_token(db, other)
+
+    result = revoke_sessions(db, [user.id for user in users], batch_size=2)
+
+    assert result == {"revoked": 9, "batches": 5, "users_updated": 3}
+    db.expire_all()
+    assert db.query(RefreshToken).filter(RefreshToken.is_active == True).count() == 1
+    renovate_access_token(db, RefreshTokenRequest(refresh_token=kept))
+
+def test_revoked_user_tokens_no_longer_rotate(db, user):
+    refresh_token = issue_refresh_token(db, user)
+    revoke_sessions(db, [user.id])
+    #a token issued before the bump that the revocation didn't reach
+    db.query(RefreshToken).update({RefreshToken.is_active: True, RefreshToken.revoked_at: None})
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        renovate_access_token(db, RefreshTokenRequest(refresh_token=refresh_token))
+
+    assert error.value.status_code == 401
+
+def test_revoke_by_issue_date(db, user):
+    issue_refresh_token(db, user)
+
+    result = revoke_sessions(db, issued_before=datetime.now(timezone.utc) + timedelta(minutes=1))
+
+    assert result["revoked"] == 1
+    assert result["users_updated"] == 0
+
+def test_user_ids_are_capped():
+    with pytest.raises(ValidationError):
+        SessionRevokeRequest(user_ids=list(range(settings.SESSION_REVOKE_MAX_USERS + 1)))
+
+def test_batches_walk_the_tokens_in_id_order(db, user):
+    for _ in range(7):
+        issue_refresh_token(db, user)
+    #already revoked rows between the active ones
+    db.query(RefreshToken).filter(RefreshToken.id % 2 == 0).update({RefreshToken.is_active: False})
+    db.commit()
+
+    result = revoke_sessions(db, issued_before=datetime.now(timezone.utc) + timedelta(minutes=1), batch_size=2)
+
+    assert result == {"revoked": 4, "batches": 2, "users_updated": 0}
+    assert db.query(RefreshToken).filter(RefreshToken.is_active == True).count() == 0
@@ -0,0 +1,76 @@
+"""Access tokens issued before a token_version bump, see token_matches_user and TokenRevocations"""
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import Base, SessionLocal, engine
+from app.main import app
+from app.models.user import User
+from app.services.revocation import token_revocations
+
+@pytest.fixture(scope="module")
+def client():
+    Base.metadata.create_all(engine)
+    with TestClient(app) as client:
+        yield client
+    Base.metadata.drop_all(engine)
+
+def login(client, username: str, password: str = "password1") -> str:
+    response = client.post("/api/auth/login", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+def register(client, username: str):
+    response = client.post("/api/auth/register", json={
+        "email": f"{username}@example.com", "username": username, "password": "password1"
+    })
+    assert response.status_code == 201
+
+def test_token_from_before_a_password_change_is_rejected(client):
+    register(client, "changer")
+    access_token = login(client, "changer")
+    headers = {"Authorization": f"Bearer {access_token}"}
+    assert client.post("/api/user/password/change", headers=headers, json={
+        "current_password": "password1", "new_password": "password2"
+    }).status_code == 200
+    #as seen by a worker whose revocation set hasn't synced yet
+    token_revocations._entries.clear()
+
+    assert client.get("/api/user/me", headers=headers).status_code == 401
+    assert client.post("/api/auth/validate", json={"access_token": access_token}).status_code == 401
+    batch = client.post("/api/auth/validate/batch", json={"access_tokens": [access_token]}).json()
+    assert [result["valid"] for result in batch["results"]] == [False]
+
+    fresh_token = login(client, "changer", "password2")
+    assert client.get("/api/user/me", headers={"Authorization": f"Bearer {fresh_token}"}).status_code == 200
+
+def test_token_from_before_an_admin_edit_is_rejected(client):
+    register(client, "boss")
+    register(client, "renamed")
+    db = SessionLocal()
+    db.query(User).filter(User.username == "boss").update({User.is_admin: True})
+    db.commit()
+    user_id = db.query(User.id).filter(User.username == "renamed").scalar()
+    db.close()
+    access_token = login(client, "renamed")
+
+    response = client.put(f"/api/user/{user_id}", headers={"Authorization": f"Bearer {login(client, 'boss')}"}, json={
+        "email": "renamed@example.com", "username": "renamed", "is_admin": True
+    })
+    assert response.status_code == 200
+
+    assert client.get("/api/user/me", headers={"Authorization": f"Bearer {access_token}"}).status_code == 401
+
+def test_sync_picks_up_rows_committed_behind_the_watermark(db, user):
+    token_revocations.sync(db)
+    #a long transaction that started before the last sync commits after it
+    db.query(User).filter(User.id == user.id).update({
+        User.token_version: 1,
+        User.updated_at: token_revocations._last_sync - timedelta(seconds=10),
+    })
+    db.commit()
+
+    token_revocations.sync(db)
+
+    assert token_revocations.is_revoked({"uid": user.id, "act": True, "ver": 0})
@@ -0,0 +1,29 @@
+"""Bulk user import, see import_users"""
+import pytest
+from fastapi import HTTPException
+
+from app.models.user import User
+from app.services.user_import import import_users
+
+CSV = "email,username,password\n" + "".join(
+    f"import{index}@example.com,import{index},password{index}\n" for index in range(3)
+)
+
+def test_import_creates_users(db):
+    result = import_users(db, CSV, "csv", batch_size=2)
+
+    assert result == {"created": 3, "duplicates": [], "errors": []}
+    assert db.query(User).count() == 3
+
+def test_row_with_extra_columns_is_an_error(db):
+    result = import_users(db, CSV + "extra@example.com,extra,password9,surplus\n", "csv")
+
+    assert result["created"] == 3
+    assert [error["row"] for error in result["errors"]] == [5]
+
+def test_files_over_max_rows_are_rejected_before_hashing(db):
+    with pytest.raises(HTTPException) as error:
+        import_users(db, CSV, "csv", max_rows=2)
+
+    assert error.value.status_code == 413
+    assert db.query(User).count() == 0
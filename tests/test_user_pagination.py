@@ -0,0 +1,22 @@
+"""Keyset pagination of the user list, see get_user_list_keyset"""
+from app.services.user import get_user_list_keyset
+from tests.conftest import create_user
+
+def test_cursor_pages_cover_users_created_in_the_same_second(db):
+    #server_default timestamps, the three users usually share the second
+    created = [create_user(db, f"page{index}").id for index in range(3)]
+
+    users, next_cursor, prev_cursor, total = get_user_list_keyset(None, 2, "exact", db)
+    assert [user.id for user in users] == created[:2]
+    assert prev_cursor is None
+    assert total == 3
+
+    users, last_cursor, prev_cursor, _ = get_user_list_keyset(next_cursor, 2, "none", db)
+    assert [user.id for user in users] == created[2:]
+    assert last_cursor is None
+
+    users, _, _, _ = get_user_list_keyset(prev_cursor, 2, "none", db)
+    assert [user.id for user in users] == created[:2]
+
+def test_count_none_skips_the_total(db, user):
+    assert get_user_list_keyset(None, 10, "none", db)[3] is None